@@ -8,26 +8,80 @@
 Run this to start the flask server.
 '''
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, g, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, g, send_file, jsonify, current_app
 from tools.config_loader import Config
-from tools.jobs.job_database import Job, get_db
-from tools.server.hpc import HPCInteraction
-from tools.submissions.slurm_submission import DummySubmissionWithFileTransfer
-
-from tools.submissions.neuralplexer_submission import NeuralplexerSubmission
-from tools.submissions.colabfold_submission import ColabFold2Submission
+from tools.jobs.job_database import Job, get_db, TERMINAL_STATUSES
+from tools.server.services import Services
+from tools.server.progress import is_stalled
+from tools.submissions.protocols import validate_inputs, create_submission, get_protocol
 
+import base64
+import json
 import tempfile
 
 import logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO, filemode='w', filename='app.log')
 
 app = Flask(__name__)
 
-config = Config()
-hpc = HPCInteraction(**config.get_hpc_config())
-app.secret_key = config.get('Server', 'secret_key')
+def create_app(config_path='config.ini', start_workers=True):
+    """Configure the app for this process.
+
+    Under a multi worker WSGI server every worker calls this, see wsgi.py.
+    Background duties only run in the worker that wins leader election.
+    """
+    logging.basicConfig(level=logging.INFO, filename='app.log')
+    config = Config(config_path)
+    app.secret_key = config.get('Server', 'secret_key')
+    app.config['DATABASE_PATH'] = config.get_database_path()
+    app.extensions['kestrel'] = Services(config)
+    if start_workers:
+        app.extensions['kestrel'].workers.start()
+    return app
+
+def services():
+    return current_app.extensions['kestrel']
+
+def is_accepted_user(userid):
+    accepted_users = [u.strip() for u in services().config.get('Server', 'accepted_users').split(',')]
+    return userid in accepted_users
+
+def queue_submission(db, job, submission):
+    """Stage the job on the cluster and hand it to the scheduler for sbatch."""
+    scripts = services().hpc.stage_job(job, submission)
+    services().scheduler.enqueue(db, job, scripts, submission.account)
+
+def submit_protocol(db, protocol, user_id, temp_dir, inputs):
+    """Validate inputs, register the job and queue it. Returns the job id.
+
+    Raises ValueError for invalid inputs, before anything is written to the database.
+    A job that fails to stage is marked failed before the error is raised.
+    """
+    validate_inputs(protocol, temp_dir, inputs)
+    job = Job(submission_type=protocol, user_id=user_id)
+    job_id = db.add_job(job)
+    try:
+        _stage_protocol(db, protocol, job, inputs)
+    except Exception:
+        db.update_job_status(job_id, 'failed')
+        raise
+    return job_id
+
+def _stage_protocol(db, protocol, job, inputs):
+    submission = create_submission(
+        protocol,
+        job,
+        inputs,
+        remote_working_directory=services().config.get('HPC', 'remote_working_directory'),
+        slurm_config=dict(
+            services().config.get_slurm_config(),
+            **services().config.get_profiling_config(),
+            **services().config.get_environment_config(protocol)
+        )
+    )
+    db.update_job_total_items(job.job_id, submission.total_items)
+    db.update_job_env_version(job.job_id, submission.env_version)
+    queue_submission(db, job, submission)
 
 @app.teardown_appcontext
 def close_db(error):
@@ -61,30 +115,18 @@ def submit_dummy():
         input_file = request.files['input_file']
         if input_file:
             # Save the file temporarily
-            with tempfile.NamedTemporaryFile() as temp_file:
-                input_filepath = temp_file.name
+            with tempfile.TemporaryDirectory() as temp_dir:
+                input_filepath = os.path.join(temp_dir, 'input_file')
                 input_file.save(input_filepath)
 
-                # Create job and submission objects
-                job = Job(submission_type="dummy", user_id="test_user")  # You might want to implement user authentication
+                # Create job and submit to HPC
                 db = get_db()
-                job_id = db.add_job(job)
-
-                slurm_config = config.get_slurm_config()
-                submission = DummySubmissionWithFileTransfer(
-                    input_filepath=input_filepath,
-                    job=job,
-                    remote_working_directory=config.get('HPC', 'remote_working_directory'),
-                    **slurm_config
-                )
-
-                # Submit job to HPC
                 try:
-                    hpc_job_id = hpc.submit_job(job, submission)
-                    db.update_job_hpc_id(job_id, hpc_job_id)
-                    flash(f'Job submitted successfully. Job ID: {job_id}', 'success')
+                    job_id = submit_protocol(db, 'dummy', "test_user", temp_dir, {'input_file': input_filepath})  # You might want to implement user authentication
+                    flash(f'Job queued successfully. Job ID: {job_id}', 'success')
                 except Exception as e:
                     flash(f'Error submitting job: {str(e)}', 'error')
+                    return redirect(request.url)
 
             return redirect(url_for('job_status', job_id=job_id))
 
@@ -100,7 +142,7 @@ def submit_neuralplexer():
         csv_file = request.files['csv_file']
         zip_file = request.files.get('zip_file')  # This is optional
         userid = request.form.get('userid')
-        if userid not in config.get('Server', 'accepted_users'):
+        if not is_accepted_user(userid):
             raise ValueError('User not authorized to submit jobs')
 
         if csv_file.filename == '':
@@ -108,56 +150,16 @@ def submit_neuralplexer():
             return redirect(request.url)
 
         with tempfile.TemporaryDirectory() as temp_dir:
-            csv_path = os.path.join(temp_dir, 'input.csv')
-            csv_file.save(csv_path)
+            inputs = {'csv_file': os.path.join(temp_dir, 'input.csv')}
+            csv_file.save(inputs['csv_file'])
             if zip_file:
-                zip_path = os.path.join(temp_dir, 'pdb_files.zip')
-                zip_file.save(zip_path)
-                # unzip them and leave the original zip file
-                os.system(f'unzip {zip_path} -d {temp_dir}')
-            else:
-                # touch a file
-                zip_path = os.path.join(temp_dir, 'pdb_files.zip')
-                os.system(f'touch {zip_path}')               
-
-
-            # Validate CSV content
-            try:
-                with open(csv_path, 'r') as f:
-                    header = f.readline().strip()
-                    if header != 'protein_seq,smiles,pdb':
-                        raise ValueError('Invalid CSV header')
-                    for line in f:
-                        if len(line.strip().split(',')) != 3:
-                            raise ValueError('Invalid CSV format')
-                        if line.strip().split(',')[2] not in ['', None] and not os.path.exists(os.path.join(temp_dir, line.strip().split(',')[2])):
-                            raise ValueError('PDB file not found')
-                # remove all the pdb files now that we have validated them
-                os.system(f'rm {temp_dir}/*.pdb')
-            except Exception as e:
-                raise e
+                inputs['zip_file'] = os.path.join(temp_dir, 'pdb_files.zip')
+                zip_file.save(inputs['zip_file'])
 
-            # Create job and submission objects
-            job = Job(submission_type="NeuralPlexer", user_id=userid)  # Implement real user authentication
+            # Validate, create job and submit to HPC
             db = get_db()
-            job_id = db.add_job(job)
-
-            slurm_config = config.get_slurm_config()
-            submission = NeuralplexerSubmission(
-                csv_path=csv_path,
-                zip_path=zip_path,
-                job=job,
-                remote_working_directory=config.get('HPC', 'remote_working_directory'),
-                **slurm_config
-            )
-
-            # Submit job to HPC
-            try:
-                hpc_job_id = hpc.submit_job(job, submission)
-                db.update_job_hpc_id(job_id, hpc_job_id)
-                flash(f'Job submitted successfully. Job ID: {job_id}', 'success')
-            except Exception as e:
-                raise e
+            job_id = submit_protocol(db, 'NeuralPlexer', userid, temp_dir, inputs)  # Implement real user authentication
+            flash(f'Job queued successfully. Job ID: {job_id}', 'success')
 
             return redirect(url_for('job_status', job_id=job_id))
 
@@ -173,7 +175,7 @@ def submit_colabfold2():
         fasta_file = request.files['fasta_file']
         userid = request.form.get('userid')
         
-        if userid not in config.get('Server', 'accepted_users'):
+        if not is_accepted_user(userid):
             flash('User not authorized to submit jobs', 'error')
             return redirect(request.url)
 
@@ -188,31 +190,16 @@ def submit_colabfold2():
 
                 # Validate FASTA file content
                 try:
-                    with open(fasta_path, 'r') as f:
-                        if not f.read().startswith('>'):
-                            raise ValueError('Invalid FASTA format')
+                    validate_inputs('ColabFold2', temp_dir, {'fasta_file': fasta_path})
                 except Exception as e:
                     flash(f'Invalid FASTA file: {str(e)}', 'error')
                     return redirect(request.url)
 
-                # Create job and submission objects
-                job = Job(submission_type="ColabFold2", user_id=userid)
+                # Create job and submit to HPC
                 db = get_db()
-                job_id = db.add_job(job)
-
-                slurm_config = config.get_slurm_config()
-                submission = ColabFold2Submission(
-                    fasta_file_path=fasta_path,
-                    job=job,
-                    remote_working_directory=config.get('HPC', 'remote_working_directory'),
-                    **slurm_config
-                )
-
-                # Submit job to HPC
                 try:
-                    hpc_job_id = hpc.submit_job(job, submission)
-                    db.update_job_hpc_id(job_id, hpc_job_id)
-                    flash(f'Job submitted successfully. Job ID: {job_id}', 'success')
+                    job_id = submit_protocol(db, 'ColabFold2', userid, temp_dir, {'fasta_file': fasta_path})
+                    flash(f'Job queued successfully. Job ID: {job_id}', 'success')
                 except Exception as e:
                     raise ValueError(f'Error submitting job.')
 
@@ -226,17 +213,22 @@ def job_status():
     if job_id:
         db = get_db()
         job = db.get_job(job_id)
-        hpc_id = job.hpc_job_id
-        status = hpc.check_job_status(hpc_id)
-        if status == 'completed':
-            carbon_footprint = hpc.get_carbon_footprint(job)
-            db.update_job_carbon_footprint(job_id, carbon_footprint)
-        db.update_job_status(job_id, status)
-        job = db.get_job(job_id)
+        queue_position = None
+        if job.status == 'queued':
+            queue_position = services().scheduler.queue_position(db, job.job_id)
+        elif job.hpc_job_id is not None and job.status not in TERMINAL_STATUSES:
+            # reads the job's sentinel, slurm is only asked if it failed or is overdue
+            services().watcher.check_jobs(db, [job])
+            job = db.get_job(job_id)
         
         if job:
             # You might want to implement real-time status checking here
-            return render_template('job_status.html', job=job)
+            progress = db.get_progress(job.job_id)
+            # finished jobs keep their last progress record, only running ones can stall
+            stalled = job.status == 'running' and is_stalled(progress, services().progress_poller.stall_factor)
+            utilization = db.get_utilization(job.job_id)
+            summary = db.get_result_summary(job.job_id)
+            return render_template('job_status.html', job=job, queue_position=queue_position, progress=progress, stalled=stalled, utilization=utilization, summary=summary)
         else:
             flash('Job not found', 'error')
     return render_template('job_status.html', job=None)
@@ -244,32 +236,196 @@ def job_status():
 @app.route('/retrieve_results/<int:job_id>')
 def retrieve_results(job_id):
     db = get_db()
-    job = db.get_job(job_id)
-    if job:
-        if job.status == 'completed':
-            result_path = os.path.join(config.get('HPC', 'local_working_directory'), 'results', job.output_filename)
-            print(result_path)
-            if os.path.exists(result_path):
-                flash('Results already retrieved', 'success')
-                return send_file(result_path, as_attachment=True)
-            
+    try:
+        job = db.get_job(job_id)
+    except ValueError:
+        flash('Job not found', 'error')
+        return redirect(url_for('job_status'))
+    if job.status != 'completed':
+        flash('Results are only available for completed jobs, please check the job status.', 'error')
+        return redirect(url_for('job_status', job_id=job_id))
+    try:
+        # served from the local result cache, downloaded first if it was not prefetched
+        result_path = services().prefetcher.get(db, job)
+    except Exception as e:
+        flash(f'Error retrieving results: {str(e)}', 'error')
+        return redirect(url_for('job_status', job_id=job_id))
+    return send_file(os.path.abspath(result_path), as_attachment=True)
+
+
+############### BATCH API
+def job_to_dict(job, progress=None):
+    if progress is not None:
+        progress = dict(progress, record_time=str(progress['record_time']), last_polled=str(progress['last_polled']))
+    return {
+        'job_id': job.job_id,
+        'hpc_job_id': job.hpc_job_id,
+        'status': job.status,
+        # nothing more will happen to the job, clients should not keep their own list of statuses
+        'finished': job.status in TERMINAL_STATUSES,
+        'submission_type': job.submission_type,
+        'user_id': job.user_id,
+        'submission_time': str(job.submission_time),
+        'last_updated': str(job.last_updated),
+        'carbon_footprint': job.carbon_footprint,
+        'total_items': job.total_items,
+        'requeue_count': job.requeue_count,
+        'env_version': job.env_version,
+        'output_size': job.output_size,
+        'output_sha256': job.output_sha256,
+        'progress': progress,
+    }
+
+def save_batch_inputs(protocol, temp_dir, item_inputs, files):
+    """Write one batch item's inputs to temp_dir, returns field name -> path.
+
+    Each input is given as {"content": text}, {"content_b64": base64} or, for
+    multipart requests, {"part": name of the uploaded file part}.
+    """
+    spec = get_protocol(protocol)
+    fields = spec['required'] + spec['optional']
+    # field names come from the client, check them before anything is written
+    unknown = set(item_inputs) - set(fields)
+    if unknown:
+        raise ValueError(f"Unexpected input(s): {', '.join(sorted(unknown))}")
+    inputs = {}
+    for field, source in item_inputs.items():
+        path = os.path.join(temp_dir, f"input_{fields.index(field)}")
+        if 'part' in source:
+            if files is None or source['part'] not in files:
+                raise ValueError(f"Missing file part {source['part']} for {field}")
+            files[source['part']].save(path)
+        elif 'content_b64' in source:
+            with open(path, 'wb') as f:
+                f.write(base64.b64decode(source['content_b64']))
+        elif 'content' in source:
+            with open(path, 'w') as f:
+                f.write(source['content'])
+        else:
+            raise ValueError(f"No content given for {field}")
+        inputs[field] = path
+    return inputs
+
+@app.route('/api/v1/jobs/batch', methods=['POST'])
+def api_submit_batch():
+    """Submit many inputs of one protocol in a single call.
+
+    Body is JSON, or multipart with the JSON in a `manifest` field and the files
+    as parts: {"protocol": ..., "userid": ..., "items": [{"idempotency_key": ..., "inputs": {...}}]}.
+    Items whose idempotency key was seen before return the original job id.
+    """
+    if request.is_json:
+        payload = request.get_json()
+        files = None
+    else:
+        payload = json.loads(request.form.get('manifest', '{}'))
+        files = request.files
+
+    userid = payload.get('userid')
+    if not is_accepted_user(userid):
+        return jsonify({'error': 'User not authorized to submit jobs'}), 403
+    protocol = payload.get('protocol')
+    try:
+        get_protocol(protocol)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    items = payload.get('items', [])
+    max_batch_size = services().config.getint('Server', 'max_batch_size', fallback=500)
+    if len(items) > max_batch_size:
+        return jsonify({'error': f'At most {max_batch_size} items per batch'}), 413
+
+    db = get_db()
+    stale_after = services().config.getfloat('Server', 'idempotency_timeout', fallback=900.0)
+    results = []
+    for index, item in enumerate(items):
+        key = item.get('idempotency_key')
+        result = {'index': index, 'idempotency_key': key}
+        if key is not None and not db.reserve_idempotency_key(userid, key, stale_after=stale_after):
+            existing = db.get_job_id_for_key(userid, key)
+            if existing is None:
+                # another request is creating this job right now
+                result.update({'error': 'An item with this idempotency key is being submitted, retry later', 'retryable': True})
+            else:
+                result.update({'job_id': existing, 'duplicate': True})
+            results.append(result)
+            continue
+
+        with tempfile.TemporaryDirectory() as temp_dir:
             try:
-                hpc.retrieve_results(job)
-                flash('Results retrieved successfully', 'success')
+                inputs = save_batch_inputs(protocol, temp_dir, item.get('inputs', {}), files)
+                job_id = submit_protocol(db, protocol, userid, temp_dir, inputs)
             except Exception as e:
-                flash(f'Error retrieving results: {str(e)}', 'error')
+                logger.info(f"Batch item {index} from {userid} rejected: {e}")
+                if key is not None:
+                    db.release_idempotency_key(userid, key)
+                result['error'] = str(e)
+                results.append(result)
+                continue
+
+        if key is not None:
+            db.set_idempotency_key_job(userid, key, job_id)
+        result.update({'job_id': job_id, 'duplicate': False})
+        results.append(result)
+    return jsonify({'jobs': results})
+
+@app.route('/api/v1/jobs')
+def api_job_status():
+    """Bulk status, eg. /api/v1/jobs?ids=1,2,3. Active jobs are refreshed from their sentinels in one call."""
+    try:
+        job_ids = [int(i) for i in request.args.get('ids', '').split(',') if i]
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma separated list of integers'}), 400
+    db = get_db()
+    jobs = db.get_jobs(job_ids)
 
-            if not os.path.exists(result_path):
-                flash('Results not found', 'error')
-        else:
-            raise ValueError('Please check job status to refresh results.')
-        send_file(result_path, as_attachment=True)
-        return redirect(url_for('job_status', job_id=job_id))
-    else:
-        flash('Job not found', 'error')
-        return redirect(url_for('job_status', job_id=job_id))
-        
-        
+    active = [job for job in jobs if job.hpc_job_id is not None and job.status not in TERMINAL_STATUSES]
+    if active:
+        services().watcher.check_jobs(db, active)
+        jobs = db.get_jobs(job_ids)
+
+    found = {job.job_id for job in jobs}
+    return jsonify({
+        'jobs': [job_to_dict(job, db.get_progress(job.job_id)) for job in jobs],
+        'missing': [i for i in job_ids if i not in found],
+    })
+
+@app.route('/api/v1/jobs/<int:job_id>/results')
+def api_job_results(job_id):
+    db = get_db()
+    try:
+        job = db.get_job(job_id)
+    except ValueError:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status != 'completed':
+        return jsonify({'error': f'Job is {job.status}', 'status': job.status}), 409
+    try:
+        result_path = services().prefetcher.get(db, job)
+    except Exception as e:
+        logger.exception(f"Could not retrieve results of job {job_id}")
+        # results that were not cached before the job directory was cleaned up are gone
+        status = 410 if job.remote_cleaned else 502
+        return jsonify({'error': f'Error retrieving results: {str(e)}'}), status
+    return send_file(os.path.abspath(result_path), as_attachment=True)
+
+@app.route('/api/v1/jobs/<int:job_id>/summary')
+def api_job_summary(job_id):
+    """Per item metrics of a completed job, without downloading its results."""
+    db = get_db()
+    try:
+        job = db.get_job(job_id)
+    except ValueError:
+        return jsonify({'error': 'Job not found'}), 404
+    summary = db.get_result_summary(job_id)
+    if summary is None:
+        return jsonify({'error': 'No summary for this job', 'status': job.status}), 404
+    return jsonify(summary)
+#################### END BATCH API
 
 if __name__ == '__main__':
-    app.run(**config.get_server_config())
\ No newline at end of file
+    # development server, see wsgi.py for production
+    # with the debug reloader only the child process should run background duties
+    config = Config()
+    server_config = config.get_server_config()
+    server_config.pop('secret_key')
+    start_workers = not server_config['debug'] or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+    create_app(start_workers=start_workers).run(**server_config)
@@ -0,0 +1,24 @@
+# gunicorn.conf.py
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Gunicorn settings for `gunicorn -c gunicorn.conf.py wsgi:app`.
+'''
+import os
+import multiprocessing
+
+from tools.config_loader import Config
+
+config = Config(os.environ.get('KESTREL_CONFIG', 'config.ini'))
+
+bind = f"{config.get('Server', 'host')}:{config.getint('Server', 'port')}"
+workers = config.getint('Server', 'workers', fallback=multiprocessing.cpu_count() * 2 + 1)
+# uploads and scp transfers block, threads keep a worker responsive meanwhile
+worker_class = 'gthread'
+threads = config.getint('Server', 'threads', fallback=4)
+timeout = config.getint('Server', 'timeout', fallback=600)
+# background threads and ssh connections do not survive a fork
+preload_app = False
@@ -0,0 +1,35 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Tests for writing batch API inputs.
+'''
+import os
+
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('paramiko')
+
+from app import save_batch_inputs
+
+
+def test_inputs_written_under_fixed_names(tmp_path):
+    inputs = save_batch_inputs('ColabFold2', str(tmp_path), {'fasta_file': {'content': '>a\nAAA\n'}}, None)
+    assert os.path.dirname(inputs['fasta_file']) == str(tmp_path)
+    with open(inputs['fasta_file']) as f:
+        assert f.read() == '>a\nAAA\n'
+
+
+def test_unknown_field_rejected_before_writing(tmp_path):
+    target = tmp_path / 'outside' / 'pwned'
+    target.parent.mkdir()
+    temp_dir = tmp_path / 'inputs'
+    temp_dir.mkdir()
+    field = os.path.relpath(target, temp_dir)
+    with pytest.raises(ValueError, match='Unexpected input'):
+        save_batch_inputs('ColabFold2', str(temp_dir), {field: {'content': 'owned'}}, None)
+    assert not target.exists()
+    assert os.listdir(temp_dir) == []
@@ -0,0 +1,75 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Tests for idempotency keys and error responses of the batch API.
+'''
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('paramiko')
+
+import app as app_module
+from tools.jobs.job_database import Job, JobDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = JobDatabase(str(tmp_path / 'jobs.db'))
+    yield db
+    db.close()
+
+
+def test_key_is_claimed_once(db):
+    assert db.reserve_idempotency_key('u', 'k')
+    # still being submitted by the first request
+    assert not db.reserve_idempotency_key('u', 'k')
+    assert db.get_job_id_for_key('u', 'k') is None
+    db.set_idempotency_key_job('u', 'k', 7)
+    assert not db.reserve_idempotency_key('u', 'k', stale_after=0)
+    assert db.get_job_id_for_key('u', 'k') == 7
+
+
+def test_stale_claim_is_taken_over(db):
+    assert db.reserve_idempotency_key('u', 'k')
+    db.cursor.execute('UPDATE idempotency_keys SET reserved = ?', (datetime.now() - timedelta(hours=1),))
+    db.conn.commit()
+    assert db.reserve_idempotency_key('u', 'k', stale_after=900)
+    # the new claim is fresh again
+    assert not db.reserve_idempotency_key('u', 'k', stale_after=900)
+
+
+def test_job_failing_to_stage_is_marked_failed(db, tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise ConnectionError('cluster unreachable')
+    monkeypatch.setattr(app_module, '_stage_protocol', fail)
+    fasta = tmp_path / 'input.fasta'
+    fasta.write_text('>a\nAAA\n')
+    with pytest.raises(ConnectionError):
+        app_module.submit_protocol(db, 'ColabFold2', 'u', str(tmp_path), {'fasta_file': str(fasta)})
+    (job_id,) = [row[0] for row in db.cursor.execute('SELECT job_id FROM jobs')]
+    assert db.get_job(job_id).status == 'failed'
+
+
+@pytest.mark.parametrize('cleaned, expected', [(False, 502), (True, 410)])
+def test_results_download_failure_is_json(tmp_path, monkeypatch, cleaned, expected):
+    db_path = str(tmp_path / 'jobs.db')
+    db = JobDatabase(db_path)
+    job_id = db.add_job(Job('ColabFold2', 'u'))
+    db.update_job_status(job_id, 'completed')
+    if cleaned:
+        db.mark_remote_cleaned([job_id])
+    db.close()
+
+    def fail(db, job):
+        raise FileNotFoundError('no such file')
+    monkeypatch.setitem(app_module.app.config, 'DATABASE_PATH', db_path)
+    monkeypatch.setitem(app_module.app.extensions, 'kestrel', SimpleNamespace(prefetcher=SimpleNamespace(get=fail)))
+    response = app_module.app.test_client().get(f'/api/v1/jobs/{job_id}/results')
+    assert response.status_code == expected
+    assert 'no such file' in response.get_json()['error']
@@ -0,0 +1,53 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Tests for the result prefetcher helpers.
+'''
+from datetime import datetime
+
+from tools.server.prefetch import parse_window, in_window, BandwidthLimiter
+
+
+def test_parse_window():
+    assert parse_window('', '06:00') is None
+    start, end = parse_window('22:00', '06:30')
+    assert (start.hour, end.hour, end.minute) == (22, 6, 30)
+
+
+def test_in_window_same_day():
+    window = parse_window('09:00', '17:00')
+    assert in_window(window, datetime(2026, 1, 1, 12))
+    assert not in_window(window, datetime(2026, 1, 1, 17))
+    assert not in_window(window, datetime(2026, 1, 1, 8, 59))
+
+
+def test_in_window_wrapping_past_midnight():
+    window = parse_window('22:00', '06:00')
+    assert in_window(window, datetime(2026, 1, 1, 23))
+    assert in_window(window, datetime(2026, 1, 1, 3))
+    assert not in_window(window, datetime(2026, 1, 1, 12))
+
+
+def test_in_window_without_window():
+    assert in_window(None, datetime(2026, 1, 1, 12))
+
+
+def test_bandwidth_limiter_paces(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr('tools.server.prefetch.time.sleep', sleeps.append)
+    limiter = BandwidthLimiter(bytes_per_second=1000)
+    progress = limiter.progress_callback()
+    # scp reports cumulative bytes
+    progress(b'f', 3000, 1000)
+    progress(b'f', 3000, 3000)
+    assert sum(sleeps) > 2.5
+
+
+def test_bandwidth_limiter_unlimited(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr('tools.server.prefetch.time.sleep', sleeps.append)
+    BandwidthLimiter(0).consume(10 ** 9)
+    assert sleeps == []
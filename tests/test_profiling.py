@@ -0,0 +1,74 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Tests for the utilization sampler and its parsing.
+'''
+import shutil
+import subprocess
+
+import pytest
+
+from tools.profiling import get_sampler_script, parse_utilization_csv, summarize_utilization
+
+
+@pytest.mark.skipif(shutil.which('bash') is None, reason='needs bash')
+def test_sampler_round_trip_with_stub(tmp_path):
+    output = tmp_path / 'utilization.csv'
+    counter = tmp_path / 'cpu_seconds'
+    counter.write_text('0')
+    # the job's processes use 2 CPU seconds per 1 second interval, ie. two busy cores
+    stub = f'C=$(( $(cat {counter}) + 2 )); echo $C > {counter}; echo 50,1000,$C,200'
+    script = get_sampler_script(str(output), stage=1, interval=1, sampler_command=stub)
+    # let the sampler take a few samples, then stop it like the job cleanup does
+    script += "sleep 2.5\nkill $SAMPLER_PID\n"
+    subprocess.run(['bash', '-c', script], check=True, timeout=30)
+
+    samples = parse_utilization_csv(output.read_text())
+    assert len(samples) >= 2
+    assert all(s['stage'] == 1 for s in samples)
+    assert samples[0]['gpu_util'] == 50.0
+    assert samples[0]['gpu_mem_mb'] == 1000.0
+    # no previous sample to take the difference to
+    assert samples[0]['cpu_util'] is None
+    assert all(s['cpu_util'] == 200.0 for s in samples[1:])
+    assert samples[0]['rss_mb'] == 200.0
+
+    (summary,) = summarize_utilization(samples)
+    assert summary['stage'] == 1
+    assert summary['n_samples'] == len(samples)
+    assert summary['mean_gpu_util'] == 50.0
+    assert summary['mean_cpu_util'] == 200.0
+    assert summary['gpu_idle_fraction'] == 0.0
+    assert summary['max_gpu_mem_mb'] == 1000.0
+    assert summary['peak_rss_mb'] == 200.0
+
+
+def test_parse_utilization_csv_skips_malformed_rows():
+    text = "timestamp,stage,gpu_util,gpu_mem_mb,cpu_util,rss_mb\n" \
+           "100,0,,,50.0,10.0\n" \
+           "not,a,valid,row,at,all\n" \
+           "110,0,2.0,500,25.0,30.0\n"
+    samples = parse_utilization_csv(text)
+    assert len(samples) == 2
+    # CPU nodes have empty GPU columns
+    assert samples[0]['gpu_util'] is None
+    assert samples[1]['gpu_util'] == 2.0
+
+
+def test_summarize_utilization_per_stage():
+    samples = [
+        {'timestamp': 0, 'stage': 0, 'gpu_util': None, 'gpu_mem_mb': None, 'cpu_util': 10.0, 'rss_mb': 5.0},
+        {'timestamp': 60, 'stage': 0, 'gpu_util': None, 'gpu_mem_mb': None, 'cpu_util': 30.0, 'rss_mb': 8.0},
+        {'timestamp': 100, 'stage': 1, 'gpu_util': 1.0, 'gpu_mem_mb': 100.0, 'cpu_util': 5.0, 'rss_mb': 1.0},
+        {'timestamp': 130, 'stage': 1, 'gpu_util': 90.0, 'gpu_mem_mb': 300.0, 'cpu_util': 5.0, 'rss_mb': 2.0},
+    ]
+    cpu, gpu = summarize_utilization(samples)
+    assert cpu['duration_seconds'] == 60
+    assert cpu['mean_cpu_util'] == 20.0
+    assert cpu['mean_gpu_util'] is None
+    assert cpu['gpu_idle_fraction'] is None
+    assert gpu['gpu_idle_fraction'] == 0.5
+    assert gpu['max_gpu_mem_mb'] == 300.0
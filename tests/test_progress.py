@@ -0,0 +1,50 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Tests for progress records.
+'''
+from datetime import datetime, timedelta
+
+import pytest
+
+from tools.server.progress import parse_progress_record, estimate, is_stalled
+
+
+def test_parse_progress_record():
+    progress = parse_progress_record("5,3,12.5,3600,1700000000\n")
+    assert progress['items_done'] == 5
+    assert progress['items_this_run'] == 3
+    assert progress['item_seconds'] == 12.5
+    assert progress['elapsed_seconds'] == 3600.0
+    assert progress['record_time'] == datetime.fromtimestamp(1700000000)
+
+
+def test_parse_progress_record_rejects_malformed():
+    with pytest.raises(ValueError):
+        parse_progress_record("5,3,12.5")
+
+
+def test_estimate_only_counts_this_run():
+    # 10 items were done before a restart, 2 by this run in an hour
+    progress = estimate(parse_progress_record("12,2,1800,3600,1700000000"), total_items=20)
+    assert progress['throughput'] == 2.0
+    assert progress['eta_seconds'] == 4 * 3600
+
+
+def test_estimate_without_items_this_run():
+    progress = estimate(parse_progress_record("12,0,0,3600,1700000000"), total_items=20)
+    assert progress['throughput'] is None
+    assert progress['eta_seconds'] is None
+
+
+def test_is_stalled():
+    now = datetime(2026, 1, 1, 12)
+    # one item per hour
+    progress = {'throughput': 1.0, 'record_time': now - timedelta(hours=2)}
+    assert not is_stalled(progress, stall_factor=3.0, now=now)
+    progress['record_time'] = now - timedelta(hours=4)
+    assert is_stalled(progress, stall_factor=3.0, now=now)
+    assert not is_stalled(None)
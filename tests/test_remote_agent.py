@@ -0,0 +1,42 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Tests for the framing and op dispatch of the remote agent.
+'''
+import io
+
+from tools.server.remote_agent import read_frame, write_frame, handle
+
+
+def test_frame_round_trip():
+    stream = io.BytesIO()
+    write_frame(stream, {'id': 1, 'ops': [{'op': 'read', 'paths': ['/a']}]})
+    write_frame(stream, {'id': 2, 'ops': []})
+    stream.seek(0)
+    assert read_frame(stream) == {'id': 1, 'ops': [{'op': 'read', 'paths': ['/a']}]}
+    assert read_frame(stream) == {'id': 2, 'ops': []}
+    # end of stream
+    assert read_frame(stream) is None
+
+
+def test_truncated_frame():
+    stream = io.BytesIO()
+    write_frame(stream, {'id': 1})
+    stream = io.BytesIO(stream.getvalue()[:-2])
+    assert read_frame(stream) is None
+
+
+def test_unknown_op():
+    result = handle({'op': 'nope'})
+    assert result['ok'] is False
+    assert 'nope' in result['error']
+
+
+def test_read_leaves_out_missing_files(tmp_path):
+    path = tmp_path / 'done.json'
+    path.write_text('{"exit_status": 0}')
+    result = handle({'op': 'read', 'paths': [str(path), str(tmp_path / 'missing')]})
+    assert result == {'ok': True, 'contents': {str(path): '{"exit_status": 0}'}}
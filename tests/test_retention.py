@@ -0,0 +1,34 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Tests for the garbage collection policy.
+'''
+from datetime import datetime, timedelta
+
+from tools.server.retention import select_for_removal
+
+
+NOW = datetime(2026, 1, 10)
+
+
+def test_removes_entries_older_than_age_limit():
+    entries = [('old', NOW - timedelta(days=5), 1), ('new', NOW - timedelta(days=1), 1)]
+    assert select_for_removal(entries, max_age_days=3, max_size_bytes=100, now=NOW) == ['old']
+
+
+def test_removes_oldest_until_under_size_limit():
+    entries = [
+        ('b', NOW - timedelta(days=2), 40),
+        ('a', NOW - timedelta(days=3), 40),
+        ('c', NOW - timedelta(days=1), 40),
+    ]
+    assert select_for_removal(entries, max_age_days=30, max_size_bytes=80, now=NOW) == ['a']
+    assert select_for_removal(entries, max_age_days=30, max_size_bytes=50, now=NOW) == ['a', 'b']
+
+
+def test_keeps_everything_within_limits():
+    entries = [('a', NOW, 10)]
+    assert select_for_removal(entries, max_age_days=1, max_size_bytes=10, now=NOW) == []
@@ -0,0 +1,61 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Tests for fair share ordering of the submission queue.
+'''
+from datetime import datetime, timedelta
+
+import pytest
+
+# the scheduler imports the database and ssh layers
+pytest.importorskip('flask')
+pytest.importorskip('paramiko')
+
+from tools.server.scheduler import SubmissionScheduler, parse_user_weights
+
+
+T0 = datetime(2026, 1, 1)
+
+
+def _entry(job_id, user_id, minutes, account='acct'):
+    return {'job_id': job_id, 'user_id': user_id, 'account': account, 'enqueue_time': T0 + timedelta(minutes=minutes)}
+
+
+def _order(scheduler, queue, user_counts=None, **kwargs):
+    return [e['job_id'] for e in scheduler._order(queue, user_counts or {}, **kwargs)]
+
+
+def test_parse_user_weights():
+    assert parse_user_weights('alice:2, bob:0.5,') == {'alice': 2.0, 'bob': 0.5}
+    assert parse_user_weights('') == {}
+
+
+@pytest.mark.parametrize('weights', ['alice:0', 'alice:2,bob:-1', 'alice:nan'])
+def test_parse_user_weights_rejects_non_positive(weights):
+    with pytest.raises(ValueError):
+        parse_user_weights(weights)
+
+
+def test_burst_interleaves_with_other_users():
+    scheduler = SubmissionScheduler(hpc=None)
+    queue = [_entry(1, 'alice', 0), _entry(2, 'alice', 1), _entry(3, 'alice', 2), _entry(4, 'bob', 3)]
+    assert _order(scheduler, queue) == [1, 4, 2, 3]
+
+
+def test_weights_and_active_jobs():
+    scheduler = SubmissionScheduler(hpc=None, user_weights={'alice': 2.0})
+    queue = [_entry(1, 'alice', 0), _entry(2, 'bob', 1)]
+    # alice's share is 2 / 2, bob's 2 / 1
+    assert _order(scheduler, queue, {'alice': 2, 'bob': 2}) == [1, 2]
+    assert _order(scheduler, queue, {'alice': 4, 'bob': 1}) == [2, 1]
+
+
+def test_quotas():
+    scheduler = SubmissionScheduler(hpc=None, max_jobs_per_user=2, max_jobs_per_account=3)
+    queue = [_entry(1, 'alice', 0), _entry(2, 'alice', 1), _entry(3, 'bob', 2, account='full')]
+    assert _order(scheduler, queue, {'alice': 1}, account_counts={'full': 3}) == [1]
+    # queue position ignores quotas
+    assert _order(scheduler, queue, {'alice': 1}, respect_quotas=False, account_counts={'full': 3}) == [3, 1, 2]
@@ -0,0 +1,24 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Tests for completion sentinel parsing.
+'''
+from tools.server.sentinel import parse_sentinel
+
+
+def test_parse_sentinel():
+    sentinel = parse_sentinel('{"exit_status": 0, "stage": 1, "final_stage": true, "slurm_job_id": "42"}\n')
+    assert sentinel['exit_status'] == 0
+    assert sentinel['slurm_job_id'] == '42'
+
+
+def test_parse_sentinel_missing_or_malformed():
+    assert parse_sentinel(None) is None
+    assert parse_sentinel('') is None
+    # a partially written file
+    assert parse_sentinel('{"exit_status": 0, "st') is None
+    assert parse_sentinel('{"stage": 1}') is None
+    assert parse_sentinel('[1, 2]') is None
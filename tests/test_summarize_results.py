@@ -0,0 +1,45 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Tests for the on cluster result summarizer.
+'''
+import json
+
+from tools.submissions.summarize_results import summarize_colabfold, summarize_neuralplexer, main
+
+
+def _pdb_line(atom, bfactor):
+    return f"ATOM      1  {atom:<3} ALA A   1      11.104  13.207   2.100  1.00{bfactor:6.2f}           C\n"
+
+
+def test_summarize_colabfold(tmp_path):
+    (tmp_path / 'q1_scores_rank_001_alphafold2_ptm_model_3_seed_000.json').write_text(
+        json.dumps({'plddt': [80, 90], 'ptm': 0.71234, 'max_pae': 12.5}))
+    (tmp_path / 'q1_unrelated.json').write_text('{}')
+    columns, rows = summarize_colabfold(str(tmp_path))
+    assert columns[0] == 'item'
+    assert rows == [{
+        'item': 'q1', 'rank': 1, 'model': 'alphafold2_ptm_model_3_seed_000',
+        'mean_plddt': 85.0, 'ptm': 0.7123, 'iptm': None, 'max_pae': 12.5,
+    }]
+
+
+def test_summarize_neuralplexer_ranks_samples(tmp_path):
+    item = tmp_path / 'result_0000'
+    item.mkdir()
+    (item / 'prot_0.pdb').write_text(_pdb_line('CA', 55.0) + _pdb_line('CB', 10.0))
+    (item / 'prot_1.pdb').write_text(_pdb_line('CA', 85.0))
+    # no confidence written
+    (item / 'prot_2.pdb').write_text(_pdb_line('CA', 0.0))
+    _, rows = summarize_neuralplexer(str(tmp_path))
+    assert [(r['sample'], r['rank'], r['mean_plddt']) for r in rows] == [(1, 1, 85.0), (0, 2, 55.0), (2, 3, None)]
+
+
+def test_main_writes_summary(tmp_path):
+    output = tmp_path / 'summary.json'
+    assert main(['summarize_results.py', 'colabfold', str(tmp_path), str(output)]) == 0
+    assert json.loads(output.read_text()) == {'protocol': 'colabfold', 'columns': summarize_colabfold(str(tmp_path))[0], 'rows': []}
+    assert main(['summarize_results.py', 'unknown', str(tmp_path), str(output)]) == 2
@@ -0,0 +1,203 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Python client for the batch API.
+
+Example
+-------
+    client = KestrelClient('http://server:5000', userid='dev1020')
+    jobs = client.submit_batch('ColabFold2', [{'fasta_file': 'a.fasta'}, {'fasta_file': 'b.fasta'}])
+    client.wait([j['job_id'] for j in jobs])
+    client.download_results([j['job_id'] for j in jobs], 'results/')
+'''
+import os
+import json
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def default_idempotency_key(protocol, inputs):
+    """Key derived from the protocol and the content of every input file.
+
+    Resubmitting the same files returns the existing jobs instead of new ones.
+    """
+    digest = hashlib.sha256(protocol.encode())
+    for field in sorted(inputs):
+        digest.update(field.encode())
+        with open(inputs[field], 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class KestrelClient:
+    """
+    Params
+    ------
+    base_url: str
+        Root url of the server, eg. http://localhost:5000
+    userid: str
+        User submitting the jobs, must be an accepted user on the server.
+    max_workers: int
+        Number of batches uploaded or results downloaded concurrently.
+    timeout: float
+        Seconds before a single http request times out.
+    """
+    def __init__(self, base_url, userid, max_workers=4, timeout=600):
+        self.base_url = base_url.rstrip('/')
+        self.userid = userid
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _url(self, path):
+        return f"{self.base_url}/api/v1/{path}"
+
+    def _submit_chunk(self, protocol, chunk):
+        manifest = {'protocol': protocol, 'userid': self.userid, 'items': []}
+        files = []
+        handles = []
+        try:
+            for item_index, (key, inputs) in enumerate(chunk):
+                item_inputs = {}
+                for field, path in inputs.items():
+                    part = f"item{item_index}_{field}"
+                    handle = open(path, 'rb')
+                    handles.append(handle)
+                    files.append((part, (os.path.basename(path), handle)))
+                    item_inputs[field] = {'part': part}
+                manifest['items'].append({'idempotency_key': key, 'inputs': item_inputs})
+            response = self.session.post(
+                self._url('jobs/batch'),
+                data={'manifest': json.dumps(manifest)},
+                files=files,
+                timeout=self.timeout
+            )
+        finally:
+            for handle in handles:
+                handle.close()
+        response.raise_for_status()
+        return response.json()['jobs']
+
+    def submit_batch(self, protocol, items, batch_size=50, idempotency_keys=None, retries=3, retry_delay=30):
+        """Submit many inputs, returns one result dict per item in the same order.
+
+        Params
+        ------
+        protocol: str
+            Submission type, eg. 'NeuralPlexer' or 'ColabFold2'.
+        items: list of dict
+            Each maps input field name (eg. 'fasta_file') to a local path.
+        batch_size: int
+            Items sent per http request. Requests are uploaded in parallel.
+        idempotency_keys: list of str, optional
+            One per item. Defaults to a hash of the item's file contents.
+        retries, retry_delay: int, float
+            Items the server reports as retryable, eg. because a parallel chunk
+            carries the same key, are sent again up to `retries` times, `retry_delay`
+            seconds apart.
+        """
+        if idempotency_keys is None:
+            idempotency_keys = [default_idempotency_key(protocol, inputs) for inputs in items]
+        if len(idempotency_keys) != len(items):
+            raise ValueError("Need exactly one idempotency key per item")
+
+        keyed = list(zip(idempotency_keys, items))
+        results = [None] * len(keyed)
+        pending = list(range(len(keyed)))
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(retry_delay)
+            chunks = list(_chunks(pending, batch_size))
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                responses = list(pool.map(lambda chunk: self._submit_chunk(protocol, [keyed[i] for i in chunk]), chunks))
+            for chunk, chunk_results in zip(chunks, responses):
+                for result in chunk_results:
+                    result['index'] = chunk[result['index']]
+                    results[result['index']] = result
+            pending = [i for i in pending if results[i].get('retryable')]
+            if not pending:
+                break
+
+        for result in results:
+            if 'error' in result:
+                logger.warning(f"Item {result['index']} rejected: {result['error']}")
+        return results
+
+    def get_status(self, job_ids, batch_size=200):
+        """Status dicts for many jobs, keyed by job id."""
+        statuses = {}
+        for chunk in _chunks(list(job_ids), batch_size):
+            response = self.session.get(
+                self._url('jobs'),
+                params={'ids': ','.join(str(i) for i in chunk)},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            for job in response.json()['jobs']:
+                statuses[job['job_id']] = job
+        return statuses
+
+    def wait(self, job_ids, poll_interval=60, timeout=None):
+        """Block until the server reports all jobs finished. Returns the final statuses.
+
+        Ids the server does not know are dropped with a warning.
+        """
+        start = time.monotonic()
+        remaining = {int(job_id) for job_id in job_ids}
+        statuses = {}
+        while remaining:
+            found = self.get_status(remaining)
+            for job_id in remaining - set(found):
+                logger.warning(f"Job {job_id} not found on the server")
+            remaining &= set(found)
+            for job_id, job in found.items():
+                statuses[job_id] = job
+                if job['finished']:
+                    remaining.discard(job_id)
+            if not remaining:
+                break
+            if timeout is not None and time.monotonic() - start > timeout:
+                raise TimeoutError(f"{len(remaining)} job(s) still running")
+            time.sleep(poll_interval)
+        return statuses
+
+    def get_summary(self, job_id):
+        """Per item metrics of a completed job, eg. to pick which results to download. None if there is none."""
+        response = self.session.get(self._url(f'jobs/{job_id}/summary'), timeout=self.timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def _download(self, job_id, destination):
+        response = self.session.get(self._url(f'jobs/{job_id}/results'), stream=True, timeout=self.timeout)
+        response.raise_for_status()
+        filename = response.headers.get('Content-Disposition', '').split('filename=')[-1].strip('"') or f"{job_id}.tar.gz"
+        path = os.path.join(destination, filename)
+        with open(path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+        return path
+
+    def download_results(self, job_ids, destination):
+        """Download result archives in parallel, returns job id -> local path."""
+        os.makedirs(destination, exist_ok=True)
+        job_ids = list(job_ids)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            paths = pool.map(lambda job_id: self._download(job_id, destination), job_ids)
+            return dict(zip(job_ids, paths))
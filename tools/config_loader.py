@@ -21,6 +21,9 @@ class Config:
     def getint(self, section, key, fallback=None):
         return self.config.getint(section, key, fallback=fallback)
 
+    def getfloat(self, section, key, fallback=None):
+        return self.config.getfloat(section, key, fallback=fallback)
+
     def getboolean(self, section, key, fallback=None):
         return self.config.getboolean(section, key, fallback=fallback)
 
@@ -30,7 +33,9 @@ class Config:
             'username': self.get('HPC', 'username'),
             'ssh_key_path': self.get('HPC', 'ssh_key_path'),
             'remote_working_directory': self.get('HPC', 'remote_working_directory'),
-            'local_working_directory': self.get('HPC', 'local_working_directory')
+            'local_working_directory': self.get('HPC', 'local_working_directory'),
+            'use_agent': self.getboolean('HPC', 'use_agent', fallback=False),
+            'agent_python': self.get('HPC', 'agent_python', fallback='python3')
         }
 
     def get_slurm_config(self):
@@ -42,7 +47,8 @@ class Config:
             'time_limit': self.get('Slurm', 'time_limit'),
             'nodes': self.getint('Slurm', 'nodes'),
             'ntasks_per_node': self.getint('Slurm', 'ntasks_per_node'),
-            'mem': self.get('Slurm', 'mem')
+            'mem': self.get('Slurm', 'mem'),
+            'use_node_scratch': self.getboolean('Slurm', 'use_node_scratch', fallback=False)
         }
 
     def get_server_config(self):
@@ -53,5 +59,69 @@ class Config:
             'secret_key': self.get('Server', 'secret_key')
         }
 
+    def get_scheduler_config(self):
+        return {
+            'max_jobs_per_user': self.getint('Scheduler', 'max_jobs_per_user', fallback=10),
+            'max_jobs_per_account': self.getint('Scheduler', 'max_jobs_per_account', fallback=50),
+            'user_weights': self.get('Scheduler', 'user_weights', fallback=''),
+            'min_submit_interval': self.getfloat('Scheduler', 'min_submit_interval', fallback=1.0),
+            'max_retries': self.getint('Scheduler', 'max_retries', fallback=5),
+            'backoff_base': self.getfloat('Scheduler', 'backoff_base', fallback=30.0),
+            'max_backoff': self.getfloat('Scheduler', 'max_backoff', fallback=1800.0),
+            'dispatch_interval': self.getfloat('Scheduler', 'dispatch_interval', fallback=10.0)
+        }
+
+    def get_retention_config(self):
+        return {
+            'remote_max_age_days': self.getfloat('Retention', 'remote_max_age_days', fallback=30.0),
+            'remote_max_size_gb': self.getfloat('Retention', 'remote_max_size_gb', fallback=500.0),
+            'local_max_age_days': self.getfloat('Retention', 'local_max_age_days', fallback=7.0),
+            'local_max_size_gb': self.getfloat('Retention', 'local_max_size_gb', fallback=50.0),
+            'gc_interval': self.getfloat('Retention', 'gc_interval', fallback=3600.0)
+        }
+
+    def get_progress_config(self):
+        return {
+            'stall_factor': self.getfloat('Progress', 'stall_factor', fallback=3.0),
+            'poll_interval': self.getfloat('Progress', 'poll_interval', fallback=300.0)
+        }
+
+    def get_resume_config(self):
+        return {
+            'max_requeues': self.getint('Resume', 'max_requeues', fallback=3)
+        }
+
+    def get_sentinel_config(self):
+        return {
+            'poll_interval': self.getfloat('Sentinel', 'poll_interval', fallback=60.0),
+            'overdue_after': self.getfloat('Sentinel', 'overdue_after', fallback=1800.0)
+        }
+
+    def get_prefetch_config(self):
+        return {
+            'enabled': self.getboolean('Prefetch', 'enabled', fallback=False),
+            'interval': self.getfloat('Prefetch', 'interval', fallback=120.0),
+            'max_cache_gb': self.getfloat('Prefetch', 'max_cache_gb', fallback=50.0),
+            'max_concurrent': self.getint('Prefetch', 'max_concurrent', fallback=2),
+            'bandwidth_mbps': self.getfloat('Prefetch', 'bandwidth_mbps', fallback=0.0),
+            'offpeak_start': self.get('Prefetch', 'offpeak_start', fallback=''),
+            'offpeak_end': self.get('Prefetch', 'offpeak_end', fallback=''),
+            'max_age_days': self.getfloat('Prefetch', 'max_age_days', fallback=2.0),
+            'verify_checksum': self.getboolean('Prefetch', 'verify_checksum', fallback=True)
+        }
+
+    def get_profiling_config(self):
+        return {
+            'sample_interval': self.getint('Profiling', 'sample_interval', fallback=0),
+            'sampler_command': self.get('Profiling', 'sampler_command', fallback=None) or None
+        }
+
+    def get_environment_config(self, submission_type):
+        """Packed environment image for a protocol, keyed by submission type in [Environments]."""
+        return {
+            'env_image': self.get('Environments', submission_type, fallback=None) or None,
+            'env_cache_dir': self.get('Environments', 'cache_dir', fallback='/tmp/$USER/kestrel_envs')
+        }
+
     def get_database_path(self):
         return self.get('Database', 'path')
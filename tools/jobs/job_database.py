@@ -8,24 +8,24 @@
 API to interact with SQlite database for slurm job tracking.
 '''
 import os
+import json
 import sqlite3
 from enum import Enum
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from flask import g
-from tools.config_loader import Config
-
-config=Config()
+from flask import g, current_app
 
 def get_db():
     if 'db' not in g:
-        g.db = JobDatabase(config.get_database_path())
+        g.db = JobDatabase(current_app.config['DATABASE_PATH'])
     return g.db
 
 class JobDatabase:
     def __init__(self, db_path='jobs.db'):
-        self.conn = sqlite3.connect(db_path)
+        # several server processes and background threads write concurrently
+        self.conn = sqlite3.connect(db_path, timeout=30)
         self.cursor = self.conn.cursor()
+        self.cursor.execute('PRAGMA journal_mode=WAL')
         self.create_table()
 
     def create_table(self):
@@ -42,13 +42,102 @@ class JobDatabase:
             carbon_footprint REAL     
         )
         ''')
+        self._add_column_if_missing('jobs', 'account', 'TEXT')
+        self._add_column_if_missing('jobs', 'remote_cleaned', 'TIMESTAMP')
+        self._add_column_if_missing('jobs', 'total_items', 'INTEGER')
+        # remote scripts and slurm ids of the last submission, used to resume
+        self._add_column_if_missing('jobs', 'hpc_job_chain', 'TEXT')
+        self._add_column_if_missing('jobs', 'requeue_count', 'INTEGER DEFAULT 0')
+        self._add_column_if_missing('jobs', 'env_version', 'TEXT')
+        # size and sha256 of the output archive, reported by the completion sentinel
+        self._add_column_if_missing('jobs', 'output_size', 'INTEGER')
+        self._add_column_if_missing('jobs', 'output_sha256', 'TEXT')
+        # when the output archive was copied to the local result cache
+        self._add_column_if_missing('jobs', 'results_cached', 'TIMESTAMP')
+        # latest progress record reported by the job scripts
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_progress (
+            job_id INTEGER PRIMARY KEY,
+            items_done INTEGER,
+            items_this_run INTEGER,
+            item_seconds REAL,
+            elapsed_seconds REAL,
+            record_time TIMESTAMP,
+            throughput REAL,
+            eta_seconds REAL,
+            last_polled TIMESTAMP
+        )
+        ''')
+        # jobs waiting for admission by the submission scheduler
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS submission_queue (
+            job_id INTEGER PRIMARY KEY,
+            user_id TEXT,
+            account TEXT,
+            scripts TEXT,
+            enqueue_time TIMESTAMP,
+            attempts INTEGER DEFAULT 0,
+            next_attempt TIMESTAMP
+        )
+        ''')
+        # GPU/CPU samples recorded by the job scripts and their per stage summary
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS utilization_samples (
+            job_id INTEGER,
+            stage INTEGER,
+            timestamp INTEGER,
+            gpu_util REAL,
+            gpu_mem_mb REAL,
+            cpu_util REAL,
+            rss_mb REAL
+        )
+        ''')
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_utilization (
+            job_id INTEGER,
+            stage INTEGER,
+            n_samples INTEGER,
+            duration_seconds REAL,
+            mean_gpu_util REAL,
+            gpu_idle_fraction REAL,
+            max_gpu_mem_mb REAL,
+            mean_cpu_util REAL,
+            peak_rss_mb REAL,
+            PRIMARY KEY (job_id, stage)
+        )
+        ''')
+        # per item metrics written by the job scripts, the summary.json document as is
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS result_summaries (
+            job_id INTEGER PRIMARY KEY,
+            summary TEXT,
+            fetched TIMESTAMP
+        )
+        ''')
+        # client supplied keys so batch submissions can be retried safely
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            user_id TEXT,
+            idempotency_key TEXT,
+            job_id INTEGER,
+            PRIMARY KEY (user_id, idempotency_key)
+        )
+        ''')
+        # when a key without a job was claimed, so claims of dead requests can be taken over
+        self._add_column_if_missing('idempotency_keys', 'reserved', 'TIMESTAMP')
         self.conn.commit()
 
+    def _add_column_if_missing(self, table, column, column_type):
+        """Columns added after the first release, so older databases keep working."""
+        columns = [row[1] for row in self.cursor.execute(f'PRAGMA table_info({table})')]
+        if column not in columns:
+            self.cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+
     def add_job(self, job):
         self.cursor.execute('''
-        INSERT INTO jobs (hpc_job_id, status, submission_type, user_id, submission_time, last_updated, output_filename, carbon_footprint)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (job.hpc_job_id, job.status, job.submission_type, job.user_id, job.submission_time, job.last_updated, job.output_filename, job.carbon_footprint))
+        INSERT INTO jobs (hpc_job_id, status, submission_type, user_id, submission_time, last_updated, output_filename, carbon_footprint, account)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (job.hpc_job_id, job.status, job.submission_type, job.user_id, job.submission_time, job.last_updated, job.output_filename, job.carbon_footprint, job.account))
         self.conn.commit()
         job.job_id = self.cursor.lastrowid
         # update the output filename with the job_id
@@ -89,18 +178,294 @@ class JobDatabase:
         job.submission_time = vals[5]
         job.last_updated = vals[6]
         job.carbon_footprint = vals[8]
+        job.account = vals[9]
+        job.remote_cleaned = vals[10]
+        job.total_items = vals[11]
+        job.hpc_job_chain = json.loads(vals[12]) if vals[12] else []
+        job.requeue_count = vals[13] or 0
+        job.env_version = vals[14]
+        job.output_size = vals[15]
+        job.output_sha256 = vals[16]
         return job
 
+    def update_job_env_version(self, job_id, env_version):
+        self.cursor.execute('''
+        UPDATE jobs SET env_version = ? WHERE job_id = ?
+        ''', (env_version, job_id))
+        self.conn.commit()
+
+    def update_job_output(self, job_id, output_size, output_sha256):
+        self.cursor.execute('''
+        UPDATE jobs SET output_size = ?, output_sha256 = ? WHERE job_id = ?
+        ''', (output_size, output_sha256 or None, job_id))
+        self.conn.commit()
+
+    def add_utilization(self, job_id, samples, summaries):
+        """Replace the stored samples and summary of a job."""
+        self.cursor.execute('DELETE FROM utilization_samples WHERE job_id = ?', (job_id,))
+        self.cursor.execute('DELETE FROM job_utilization WHERE job_id = ?', (job_id,))
+        self.cursor.executemany('''
+        INSERT INTO utilization_samples (job_id, stage, timestamp, gpu_util, gpu_mem_mb, cpu_util, rss_mb)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (job_id, s['stage'], s['timestamp'], s['gpu_util'], s['gpu_mem_mb'], s['cpu_util'], s['rss_mb'])
+            for s in samples
+        ])
+        self.cursor.executemany('''
+        INSERT INTO job_utilization
+        (job_id, stage, n_samples, duration_seconds, mean_gpu_util, gpu_idle_fraction, max_gpu_mem_mb, mean_cpu_util, peak_rss_mb)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (job_id, s['stage'], s['n_samples'], s['duration_seconds'], s['mean_gpu_util'], s['gpu_idle_fraction'],
+             s['max_gpu_mem_mb'], s['mean_cpu_util'], s['peak_rss_mb'])
+            for s in summaries
+        ])
+        self.conn.commit()
+
+    def get_utilization(self, job_id):
+        """Per stage utilization summary of a job, ordered by stage."""
+        self.cursor.execute('''
+        SELECT stage, n_samples, duration_seconds, mean_gpu_util, gpu_idle_fraction, max_gpu_mem_mb, mean_cpu_util, peak_rss_mb
+        FROM job_utilization WHERE job_id = ? ORDER BY stage
+        ''', (job_id,))
+        keys = ['stage', 'n_samples', 'duration_seconds', 'mean_gpu_util', 'gpu_idle_fraction', 'max_gpu_mem_mb', 'mean_cpu_util', 'peak_rss_mb']
+        return [dict(zip(keys, row)) for row in self.cursor.fetchall()]
+
+    def set_result_summary(self, job_id, summary):
+        self.cursor.execute('''
+        INSERT OR REPLACE INTO result_summaries (job_id, summary, fetched) VALUES (?, ?, ?)
+        ''', (job_id, json.dumps(summary), datetime.now()))
+        self.conn.commit()
+
+    def get_result_summary(self, job_id):
+        """Stored summary of a job with `protocol`, `columns` and `rows`, None if there is none."""
+        self.cursor.execute('SELECT summary FROM result_summaries WHERE job_id = ?', (job_id,))
+        row = self.cursor.fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update_job_hpc_chain(self, job_id, scripts, hpc_job_ids):
+        """Record which slurm job runs which remote script, in dependency order."""
+        chain = [{'script': script, 'hpc_job_id': hpc_job_id} for script, hpc_job_id in zip(scripts, hpc_job_ids)]
+        self.cursor.execute('''
+        UPDATE jobs SET hpc_job_chain = ? WHERE job_id = ?
+        ''', (json.dumps(chain), job_id))
+        self.conn.commit()
+
+    def increment_requeue_count(self, job_id):
+        self.cursor.execute('''
+        UPDATE jobs SET requeue_count = COALESCE(requeue_count, 0) + 1 WHERE job_id = ?
+        ''', (job_id,))
+        self.conn.commit()
+
+    def update_job_total_items(self, job_id, total_items):
+        self.cursor.execute('''
+        UPDATE jobs SET total_items = ? WHERE job_id = ?
+        ''', (total_items, job_id))
+        self.conn.commit()
+
+    def get_active_jobs(self):
+        """(job_id, hpc_job_id) of jobs submitted to slurm that have not finished."""
+        placeholders = ', '.join('?' for _ in TERMINAL_STATUSES)
+        self.cursor.execute(f'''
+        SELECT job_id, hpc_job_id FROM jobs
+        WHERE hpc_job_id IS NOT NULL AND status NOT IN ({placeholders})
+        ''', TERMINAL_STATUSES)
+        return self.cursor.fetchall()
+
+    def update_progress(self, job_id, progress):
+        self.cursor.execute('''
+        INSERT OR REPLACE INTO job_progress
+        (job_id, items_done, items_this_run, item_seconds, elapsed_seconds, record_time, throughput, eta_seconds, last_polled)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            job_id,
+            progress['items_done'],
+            progress['items_this_run'],
+            progress['item_seconds'],
+            progress['elapsed_seconds'],
+            progress['record_time'],
+            progress['throughput'],
+            progress['eta_seconds'],
+            datetime.now()
+        ))
+        self.conn.commit()
+
+    def get_progress(self, job_id):
+        self.cursor.execute('''
+        SELECT items_done, items_this_run, item_seconds, elapsed_seconds, record_time, throughput, eta_seconds, last_polled
+        FROM job_progress WHERE job_id = ?
+        ''', (job_id,))
+        row = self.cursor.fetchone()
+        if row is None:
+            return None
+        keys = ['items_done', 'items_this_run', 'item_seconds', 'elapsed_seconds', 'record_time', 'throughput', 'eta_seconds', 'last_polled']
+        progress = dict(zip(keys, row))
+        progress['record_time'] = datetime.fromisoformat(str(progress['record_time']))
+        return progress
+
+    def get_jobs_to_clean(self):
+        """(job_id, last_updated) of finished jobs whose remote directory still exists, oldest first."""
+        placeholders = ', '.join('?' for _ in TERMINAL_STATUSES)
+        self.cursor.execute(f'''
+        SELECT job_id, last_updated FROM jobs
+        WHERE status IN ({placeholders}) AND remote_cleaned IS NULL
+        ORDER BY last_updated
+        ''', TERMINAL_STATUSES)
+        return [(row[0], datetime.fromisoformat(str(row[1]))) for row in self.cursor.fetchall()]
+
+    def get_jobs_to_prefetch(self, since):
+        """Ids of jobs completed after `since` whose results were never cached locally, oldest first."""
+        self.cursor.execute('''
+        SELECT job_id FROM jobs
+        WHERE status = ? AND results_cached IS NULL AND remote_cleaned IS NULL AND last_updated >= ?
+        ORDER BY last_updated
+        ''', (JobStatus.COMPLETED.value, since))
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def mark_results_cached(self, job_id):
+        self.cursor.execute('''
+        UPDATE jobs SET results_cached = ? WHERE job_id = ?
+        ''', (datetime.now(), job_id))
+        self.conn.commit()
+
+    def mark_remote_cleaned(self, job_ids):
+        self.cursor.executemany('''
+        UPDATE jobs SET remote_cleaned = ? WHERE job_id = ?
+        ''', [(datetime.now(), job_id) for job_id in job_ids])
+        self.conn.commit()
+
+    def get_job_id_for_key(self, user_id, idempotency_key):
+        self.cursor.execute('''
+        SELECT job_id FROM idempotency_keys WHERE user_id = ? AND idempotency_key = ?
+        ''', (user_id, idempotency_key))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def reserve_idempotency_key(self, user_id, idempotency_key, stale_after=900.0):
+        """Claim a key before creating its job. False if the key was already used or is being used.
+
+        A claim that got no job within `stale_after` seconds belongs to a request
+        that died, it is taken over.
+        """
+        now = datetime.now()
+        try:
+            self.cursor.execute('''
+            INSERT INTO idempotency_keys (user_id, idempotency_key, job_id, reserved) VALUES (?, ?, NULL, ?)
+            ''', (user_id, idempotency_key, now))
+        except sqlite3.IntegrityError:
+            self.cursor.execute('''
+            UPDATE idempotency_keys SET reserved = ?
+            WHERE user_id = ? AND idempotency_key = ? AND job_id IS NULL AND (reserved IS NULL OR reserved < ?)
+            ''', (now, user_id, idempotency_key, now - timedelta(seconds=stale_after)))
+            self.conn.commit()
+            return self.cursor.rowcount == 1
+        self.conn.commit()
+        return True
+
+    def set_idempotency_key_job(self, user_id, idempotency_key, job_id):
+        self.cursor.execute('''
+        UPDATE idempotency_keys SET job_id = ? WHERE user_id = ? AND idempotency_key = ?
+        ''', (job_id, user_id, idempotency_key))
+        self.conn.commit()
+
+    def release_idempotency_key(self, user_id, idempotency_key):
+        self.cursor.execute('''
+        DELETE FROM idempotency_keys WHERE user_id = ? AND idempotency_key = ?
+        ''', (user_id, idempotency_key))
+        self.conn.commit()
+
+    def get_jobs(self, job_ids):
+        """Jobs for the given ids that exist, in the same order."""
+        jobs = []
+        for job_id in job_ids:
+            try:
+                jobs.append(self.get_job(job_id))
+            except ValueError:
+                continue
+        return jobs
+
+    def count_active_jobs(self, column):
+        """Number of jobs on the cluster, grouped by `column`.
+
+        Any job with a slurm id that is not finished counts, whatever state slurm
+        reports. Requeued jobs keep their old slurm id while waiting in the queue
+        and do not count.
+        """
+        excluded = TERMINAL_STATUSES + (JobStatus.QUEUED.value, JobStatus.UNSUBMITTED.value)
+        placeholders = ', '.join('?' for _ in excluded)
+        self.cursor.execute(f'''
+        SELECT {column}, COUNT(*) FROM jobs
+        WHERE hpc_job_id IS NOT NULL AND status NOT IN ({placeholders})
+        GROUP BY {column}
+        ''', excluded)
+        return dict(self.cursor.fetchall())
+
+    def add_to_queue(self, job, scripts, account):
+        self.cursor.execute('''
+        INSERT OR REPLACE INTO submission_queue (job_id, user_id, account, scripts, enqueue_time, attempts, next_attempt)
+        VALUES (?, ?, ?, ?, ?, 0, ?)
+        ''', (job.job_id, job.user_id, account, json.dumps(scripts), datetime.now(), datetime.now()))
+        self.cursor.execute('''
+        UPDATE jobs SET status = ?, account = ?, last_updated = ? WHERE job_id = ?
+        ''', (JobStatus.QUEUED.value, account, datetime.now(), job.job_id))
+        self.conn.commit()
+
+    def get_queue(self):
+        """Queued submissions, oldest first."""
+        self.cursor.execute('''
+        SELECT job_id, user_id, account, scripts, enqueue_time, attempts, next_attempt
+        FROM submission_queue ORDER BY enqueue_time
+        ''')
+        return [
+            {
+                'job_id': row[0],
+                'user_id': row[1],
+                'account': row[2],
+                'scripts': json.loads(row[3]),
+                'enqueue_time': row[4],
+                'attempts': row[5],
+                'next_attempt': datetime.fromisoformat(str(row[6])),
+            }
+            for row in self.cursor.fetchall()
+        ]
+
+    def update_queue_attempt(self, job_id, attempts, next_attempt):
+        self.cursor.execute('''
+        UPDATE submission_queue SET attempts = ?, next_attempt = ? WHERE job_id = ?
+        ''', (attempts, next_attempt, job_id))
+        self.conn.commit()
+
+    def remove_from_queue(self, job_id):
+        self.cursor.execute('DELETE FROM submission_queue WHERE job_id = ?', (job_id,))
+        self.conn.commit()
+
     def close(self):
         self.conn.close()
 
 class JobStatus(Enum):
     UNSUBMITTED = "unsubmitted"
+    QUEUED = "queued"
     PENDING = "pending"
     RUNNING = "running"
     COMPLETED = "completed"
     FAILED = "failed"
 
+# slurm states after which a job can be resubmitted to finish its remaining items
+RESUMABLE_STATUSES = ('timeout', 'preempted', 'node_fail')
+
+# slurm states after which nothing more will happen to a job
+TERMINAL_STATUSES = (
+    JobStatus.COMPLETED.value,
+    JobStatus.FAILED.value,
+    'cancelled',
+    'timeout',
+    'out_of_memory',
+    'node_fail',
+    'preempted',
+    'boot_fail',
+    'deadline',
+)
+
 class Job:
     def __init__(self, submission_type=None, user_id=None):
         self.job_id = None
@@ -111,6 +476,14 @@ class Job:
         self.submission_time = datetime.now()
         self.last_updated = datetime.now()
         self.carbon_footprint = None
+        self.account = None
+        self.remote_cleaned = None
+        self.total_items = None
+        self.hpc_job_chain = []
+        self.requeue_count = 0
+        self.env_version = None
+        self.output_size = None
+        self.output_sha256 = None
 
     def update_status(self, new_status):
         self.status = new_status
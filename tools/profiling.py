@@ -0,0 +1,138 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Tools for GPU and CPU utilization profiling
+'''
+import csv
+import io
+
+UTILIZATION_COLUMNS = ['timestamp', 'stage', 'gpu_util', 'gpu_mem_mb', 'cpu_util', 'rss_mb']
+
+# below this GPU utilization [%] a sample counts as idle
+GPU_IDLE_THRESHOLD = 5.0
+
+
+def get_sampler_script(output_path, stage, interval, sampler_command=None):
+    """
+    Params
+    ------
+    output_path: str
+        CSV on the remote cluster the samples are appended to
+    stage: int
+        Index of the script in the submission, recorded with every sample
+    interval: int
+        Seconds between samples
+    sampler_command: str, optional
+        Command printing one "gpu_util,gpu_mem_mb,cpu_seconds,rss_mb" line per call,
+        replaces the built in nvidia-smi and ps sampling, eg. a stub for local testing.
+        cpu_seconds is the cumulative CPU time of the job's processes.
+
+    Returns shell that starts the sampler in the background and stores its pid in SAMPLER_PID.
+
+    CPU utilization [%] is the CPU time used since the previous sample over the
+    interval, so idle gaps show even in long running processes. The first
+    sample of a stage has none.
+    """
+    if sampler_command is None:
+        # GPU utilization averaged and memory summed over visible GPUs, empty on CPU nodes.
+        # CPU time [s] and RSS [MB] summed over the processes of this job's session,
+        # cputime is [DD-]HH:MM:SS.
+        sample = """    local GPU=","
+    if command -v ${NVIDIA_SMI:-nvidia-smi} > /dev/null 2>&1; then
+        GPU=$(${NVIDIA_SMI:-nvidia-smi} --query-gpu=utilization.gpu,memory.used --format=csv,noheader,nounits | awk -F', *' '{u += $1; m += $2} END {if (NR) printf "%.1f,%.0f", u / NR, m; else printf ","}')
+    fi
+    local PROC=$(ps -o cputime=,rss= -s $SESSION_ID | awk '{
+        t = $1; d = 0
+        if (index(t, "-")) { split(t, p, "-"); d = p[1]; t = p[2] }
+        n = split(t, f, ":"); s = 0
+        for (i = 1; i <= n; i++) s = s * 60 + f[i]
+        c += d * 86400 + s; r += $2
+    } END {printf "%d,%.1f", c, r / 1024}')
+    echo "$GPU,$PROC\""""
+    else:
+        sample = f"""    {sampler_command}"""
+    return f"""############### UTILIZATION PROFILING
+UTILIZATION_FILE={output_path}
+SESSION_ID=$(ps -o sid= -p $$ | tr -d ' ')
+if [ ! -f "$UTILIZATION_FILE" ]; then
+    echo "{','.join(UTILIZATION_COLUMNS)}" > "$UTILIZATION_FILE"
+fi
+""" + """sample_utilization() {
+""" + sample + """
+}
+(
+    PREV_CPU=""
+    while true; do
+        SAMPLE=$(sample_utilization)
+        CPU_SECONDS=$(echo "$SAMPLE" | cut -d, -f3)
+        CPU_UTIL=""
+        if [ -n "$PREV_CPU" ] && [ -n "$CPU_SECONDS" ]; then
+            # processes that exited take their CPU time with them, never report below zero
+            CPU_UTIL=$(awk -v a="$PREV_CPU" -v b="$CPU_SECONDS" 'BEGIN {d = b - a; if (d < 0) d = 0; printf "%.1f", d / """ + str(interval) + """ * 100}')
+        fi
+        PREV_CPU=$CPU_SECONDS
+        echo "$(date +%s),""" + str(stage) + """,$(echo "$SAMPLE" | cut -d, -f1,2),$CPU_UTIL,$(echo "$SAMPLE" | cut -d, -f4)" >> "$UTILIZATION_FILE"
+        sleep """ + str(interval) + """
+    done
+) &
+SAMPLER_PID=$!
+#################### END UTILIZATION PROFILING
+"""
+
+
+def _float(value):
+    return float(value) if value not in ('', None) else None
+
+
+def parse_utilization_csv(text):
+    """Parse the sampler CSV into a list of dicts, skipping malformed rows."""
+    samples = []
+    for row in csv.DictReader(io.StringIO(text)):
+        try:
+            samples.append({
+                'timestamp': int(row['timestamp']),
+                'stage': int(row['stage']),
+                'gpu_util': _float(row['gpu_util']),
+                'gpu_mem_mb': _float(row['gpu_mem_mb']),
+                'cpu_util': _float(row['cpu_util']),
+                'rss_mb': _float(row['rss_mb']),
+            })
+        except (KeyError, TypeError, ValueError):
+            continue
+    return samples
+
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def _max(values):
+    values = [v for v in values if v is not None]
+    return max(values) if values else None
+
+
+def summarize_utilization(samples):
+    """Per stage summary of utilization samples, a list of dicts ordered by stage."""
+    by_stage = {}
+    for sample in samples:
+        by_stage.setdefault(sample['stage'], []).append(sample)
+
+    summaries = []
+    for stage, stage_samples in sorted(by_stage.items()):
+        gpu = [s['gpu_util'] for s in stage_samples if s['gpu_util'] is not None]
+        timestamps = [s['timestamp'] for s in stage_samples]
+        summaries.append({
+            'stage': stage,
+            'n_samples': len(stage_samples),
+            'duration_seconds': max(timestamps) - min(timestamps),
+            'mean_gpu_util': _mean(gpu),
+            'gpu_idle_fraction': sum(1 for u in gpu if u < GPU_IDLE_THRESHOLD) / len(gpu) if gpu else None,
+            'max_gpu_mem_mb': _max(s['gpu_mem_mb'] for s in stage_samples),
+            'mean_cpu_util': _mean(s['cpu_util'] for s in stage_samples),
+            'peak_rss_mb': _max(s['rss_mb'] for s in stage_samples),
+        })
+    return summaries
@@ -0,0 +1,73 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Client side of the persistent remote agent.
+
+Instead of opening an SSH exec channel and a login shell for every operation,
+the agent in tools/server/remote_agent.py is started once and receives batches
+of operations over its stdin/stdout, see that module for the protocol.
+'''
+import os
+import threading
+
+from tools.server.remote_agent import read_frame, write_frame
+
+import logging
+logger = logging.getLogger(__name__)
+
+AGENT_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'remote_agent.py')
+
+
+class AgentError(Exception):
+    """The agent connection broke, the caller should fall back or reconnect."""
+
+
+class RemoteAgent:
+    """
+    Params
+    ------
+    reader, writer: binary file like objects
+        Connected to the agent's stdout and stdin.
+    channel: optional
+        Closed together with the agent.
+    """
+    def __init__(self, reader, writer, channel=None):
+        self.reader = reader
+        self.writer = writer
+        self.channel = channel
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    @classmethod
+    def launch(cls, ssh_client, remote_path, python='python3'):
+        """Start an already uploaded agent on the remote host over a long lived channel."""
+        channel = ssh_client.get_transport().open_session()
+        channel.exec_command(f"{python} -u {remote_path}")
+        return cls(channel.makefile('rb'), channel.makefile_stdin('wb'), channel=channel)
+
+    def call(self, ops):
+        """Run a batch of operations, returns one result dict per op in order."""
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            try:
+                write_frame(self.writer, {'id': request_id, 'ops': ops})
+                response = read_frame(self.reader)
+            except (OSError, EOFError, ValueError) as e:
+                raise AgentError(f"Agent connection failed: {e}") from e
+        if response is None:
+            raise AgentError("Agent closed the connection")
+        if response.get('id') != request_id:
+            raise AgentError(f"Agent answered request {response.get('id')}, expected {request_id}")
+        return response['results']
+
+    def close(self):
+        try:
+            self.writer.close()
+        except OSError:
+            pass
+        if self.channel is not None:
+            self.channel.close()
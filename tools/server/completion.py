@@ -0,0 +1,58 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Work done once when a job is seen to complete, wherever that is detected.
+'''
+import json
+
+from tools.profiling import parse_utilization_csv, summarize_utilization
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class CompletionHandler:
+    """
+    Params
+    ------
+    hpc: HPCInteraction
+    """
+    def __init__(self, hpc):
+        self.hpc = hpc
+
+    def ingest_utilization(self, db, job):
+        """Store the utilization samples of a job and their per stage summary."""
+        text = self.hpc.read_file(f"{self.hpc.remote_working_directory}/{job.job_id}/utilization.csv")
+        if not text:
+            return
+        samples = parse_utilization_csv(text)
+        db.add_utilization(job.job_id, samples, summarize_utilization(samples))
+        logger.info(f"Ingested {len(samples)} utilization samples for job {job.job_id}")
+
+    def ingest_summary(self, db, job):
+        """Store the per item metrics the job wrote to summary.json, a few kB instead of the whole archive."""
+        text = self.hpc.read_file(f"{self.hpc.remote_working_directory}/{job.job_id}/summary.json")
+        if not text:
+            return
+        summary = json.loads(text)
+        db.set_result_summary(job.job_id, summary)
+        logger.info(f"Ingested result summary with {len(summary['rows'])} rows for job {job.job_id}")
+
+    def handle(self, db, job):
+        """Call once when `job` reaches completed. Everything here is best effort and must not block completion."""
+        try:
+            db.update_job_carbon_footprint(job.job_id, self.hpc.get_carbon_footprint(job))
+        except Exception:
+            # emissions.csv is missing or empty if the tracker did not run
+            logger.exception(f"Could not read carbon footprint for job {job.job_id}")
+        try:
+            self.ingest_utilization(db, job)
+        except Exception:
+            logger.exception(f"Could not ingest utilization for job {job.job_id}")
+        try:
+            self.ingest_summary(db, job)
+        except Exception:
+            logger.exception(f"Could not ingest result summary for job {job.job_id}")
@@ -9,39 +9,127 @@ Wrapper for interaction with HPC.
 '''
 import paramiko
 import os
+import re
+import threading
 from scp import SCPClient
 
 from tools.carbon import get_emissions_command_from_job
+from tools.server.agent import RemoteAgent, AgentError, AGENT_SOURCE
 
 import logging
 logger = logging.getLogger(__name__)
 
+# sbatch errors that clear up on their own, eg. when the account is at its
+# submit limit or the controller is busy. These are retried with backoff.
+TRANSIENT_SBATCH_ERRORS = (
+    'QOSMaxSubmitJobPerUserLimit',
+    'AssocMaxSubmitJobLimit',
+    'MaxSubmitJobsLimit',
+    # 'Socket timed out' is deliberately not here, slurmctld may have accepted
+    # the job before the reply was lost and retrying would submit it twice
+    'Slurm temporarily unable',
+    'Resource temporarily unavailable',
+)
+
+# squeue compact states to job statuses, sacct states are lowercased instead
+SQUEUE_STATES = {
+    'R': 'running',
+    'PD': 'pending',
+    'CF': 'pending',
+    'CG': 'completed',
+    'F': 'failed',
+    'PR': 'preempted',
+    'TO': 'timeout',
+    'NF': 'node_fail',
+}
+
+class SubmissionError(Exception):
+    """sbatch did not return a job id."""
+    def __init__(self, message, transient=False):
+        super().__init__(message)
+        self.transient = transient
+
 class HPCInteraction:
-    def __init__(self, hostname, username, ssh_key_path, remote_working_directory, local_working_directory):
+    def __init__(self, hostname, username, ssh_key_path, remote_working_directory, local_working_directory, use_agent=False, agent_python='python3'):
         self.hostname = hostname
         self.username = username
         self.key_filename = ssh_key_path
         self.client = None
         self.remote_working_directory = remote_working_directory
         self.local_working_directory = local_working_directory
+        # request handlers and background duties share the connection
+        self._connect_lock = threading.Lock()
+        # optional persistent agent on the login node, see tools/server/agent.py
+        self.use_agent = use_agent
+        self.agent_python = agent_python
+        self._agent = None
+        self._agent_lock = threading.Lock()
 
 
     def connect(self):
-        self.client = paramiko.SSHClient()
-        self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        self.client.connect(self.hostname, username=self.username, key_filename=self.key_filename, timeout=5000)
+        with self._connect_lock:
+            if self.client is not None and self.client.get_transport() is not None and self.client.get_transport().is_active():
+                return
+            client = paramiko.SSHClient()
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            client.connect(self.hostname, username=self.username, key_filename=self.key_filename, timeout=5000)
+            self.client = client
 
     def disconnect(self):
+        self._close_agent()
         if self.client:
             self.client.close()
 
+    def _get_agent(self):
+        with self._agent_lock:
+            if self._agent is None:
+                self.connect()
+                remote_path = f"{self.remote_working_directory}/.kestrel_agent.py"
+                with SCPClient(self.client.get_transport()) as scp:
+                    scp.put(AGENT_SOURCE, remote_path)
+                self._agent = RemoteAgent.launch(self.client, remote_path, python=self.agent_python)
+                logger.info(f"Started remote agent {remote_path}")
+            return self._agent
+
+    def _close_agent(self):
+        with self._agent_lock:
+            if self._agent is not None:
+                self._agent.close()
+                self._agent = None
+
+    def _agent_call(self, ops):
+        """Results of a batch of agent ops, None if the agent is disabled or unavailable.
+
+        Callers fall back to exec channels on None. A broken agent is relaunched
+        on the next call.
+        """
+        if not self.use_agent:
+            return None
+        try:
+            return self._get_agent().call(ops)
+        except (AgentError, OSError, paramiko.SSHException) as e:
+            logger.warning(f"Remote agent unavailable, falling back to exec channels: {e}")
+            self._close_agent()
+            return None
+
     def execute_command(self, command):
-        if not self.client:
-            self.connect()
+        results = self._agent_call([{'op': 'run', 'cmd': command}])
+        if results is not None:
+            result = results[0]
+            if not result['ok']:
+                return '', result['error']
+            return result['stdout'], result['stderr']
+
+        self.connect()
         stdin, stdout, stderr = self.client.exec_command(command)
         return stdout.read().decode('utf-8'), stderr.read().decode('utf-8')
 
-    def submit_job(self, job, slurm_submission):
+    def stage_job(self, job, slurm_submission):
+        """Create the remote working directory, transfer inputs and job scripts.
+
+        Returns the list of remote script paths, in dependency order. Nothing is
+        submitted to slurm here, see `sbatch` and `submit_scripts`.
+        """
         if not self.client:
             self.connect()
 
@@ -60,7 +148,7 @@ class HPCInteraction:
         # Generate and transfer the job script
         # these are a list of scripts
         script_content = slurm_submission.generate_script()
-        hpc_job_id = None
+        remote_script_paths = []
         for i, s in enumerate(script_content):
             script_filename = os.path.join(self.local_working_directory, 'submissions', f"job_script_{job.job_id}_{i}.sh")
             with open(script_filename, 'w') as f:
@@ -69,26 +157,87 @@ class HPCInteraction:
             with SCPClient(self.client.get_transport()) as scp:
                 scp.put(script_filename, remote_script_path)
             logger.info(f"Transferred {script_filename} to {remote_script_path}")
-            
-            # Submit the job
-            if hpc_job_id is None:
-                submit_command = f"sbatch {remote_script_path}"
-            else:
-                submit_command = f"sbatch --dependency=afterok:{hpc_job_id} {remote_script_path}"
-            logger.info(f"Submitting job {job.job_id} with command: {submit_command}")
-            stdout, stderr = self.execute_command(submit_command)
-            
-            # Parse job ID from Slurm output
-            hpc_job_id = stdout.strip().split()[-1]
-            logger.info(f"Submitted job {job.job_id} with HPC job ID {hpc_job_id}")
-        
-        # Clean up local script file
-        os.remove(script_filename)
-        
+            # Clean up local script file
+            os.remove(script_filename)
+            remote_script_paths.append(remote_script_path)
+
+        return remote_script_paths
+
+    def sbatch(self, remote_script_path, dependency=None):
+        """Submit a single script and return its slurm job id.
+
+        Raises SubmissionError if slurm does not report a job id.
+        """
+        if self.use_agent:
+            return self._agent_sbatch({'op': 'sbatch', 'script': remote_script_path, 'dependency': dependency})['job_id']
+
+        if dependency is None:
+            submit_command = f"sbatch {remote_script_path}"
+        else:
+            # if the previous stage fails, cancel this one rather than leave it pending forever
+            submit_command = f"sbatch --dependency=afterok:{dependency} --kill-on-invalid-dep=yes {remote_script_path}"
+        logger.info(f"Submitting with command: {submit_command}")
+        stdout, stderr = self.execute_command(submit_command)
+
+        # Parse job ID from Slurm output, eg. "Submitted batch job 123456"
+        match = re.search(r"Submitted batch job (\d+)", stdout)
+        if match is None:
+            message = stderr.strip() or stdout.strip() or 'no output from sbatch'
+            raise SubmissionError(message, transient=self._is_transient(message))
+        return match.group(1)
+
+    @staticmethod
+    def _is_transient(message):
+        return any(marker in message for marker in TRANSIENT_SBATCH_ERRORS)
+
+    def _agent_sbatch(self, op):
+        """Submission through the agent. Does not fall back to exec channels, since
+        a lost response could otherwise mean submitting twice."""
+        try:
+            result = self._get_agent().call([op])[0]
+        except (AgentError, OSError, paramiko.SSHException) as e:
+            self._close_agent()
+            raise SubmissionError(f"Remote agent failed: {e}", transient=True) from e
+        if not result['ok']:
+            raise SubmissionError(result['error'], transient=self._is_transient(result['error']))
+        return result
+
+    def submit_scripts(self, remote_script_paths):
+        """Submit staged scripts as a dependency chain, returns the slurm job ids in order.
+
+        If a later script in the chain fails to submit, the already submitted
+        ones are cancelled so the chain can be retried as a whole.
+        """
+        if self.use_agent:
+            # the whole chain in one round trip
+            submitted = self._agent_sbatch({'op': 'sbatch_chain', 'scripts': list(remote_script_paths)})['job_ids']
+            logger.info(f"Submitted {remote_script_paths} with HPC job IDs {submitted}")
+            return submitted
+
+        submitted = []
+        try:
+            for remote_script_path in remote_script_paths:
+                dependency = submitted[-1] if submitted else None
+                submitted.append(self.sbatch(remote_script_path, dependency=dependency))
+        except SubmissionError:
+            for hpc_job_id in submitted:
+                self.cancel_job(hpc_job_id)
+            raise
+        logger.info(f"Submitted {remote_script_paths} with HPC job IDs {submitted}")
+        return submitted
+
+    def submit_job(self, job, slurm_submission):
+        remote_script_paths = self.stage_job(job, slurm_submission)
+        hpc_job_id = self.submit_scripts(remote_script_paths)[-1]
+        logger.info(f"Submitted job {job.job_id} with HPC job ID {hpc_job_id}")
         return hpc_job_id
+
+    def cancel_job(self, hpc_job_id):
+        self.execute_command(f"scancel {hpc_job_id}")
+        logger.info(f"Cancelled HPC job {hpc_job_id}")
     
     def update_all_uncompleted_jobs_status(self, db):
-        query = "SELECT job_id, hpc_job_id FROM jobs WHERE status != 'completed' AND status != 'failed'"
+        query = "SELECT job_id, hpc_job_id FROM jobs WHERE status NOT IN ('completed', 'failed', 'queued', 'unsubmitted')"
         jobs = db.cursor.execute(query).fetchall()
 
         for job_id, hpc_job_id in jobs:
@@ -96,6 +245,9 @@ class HPCInteraction:
             db.update_job_status(job_id, status)
 
     def check_job_status(self, hpc_job_id):
+        if self.use_agent:
+            return self.check_jobs_status([hpc_job_id]).get(str(hpc_job_id), 'failed')
+
         command = f"squeue -j {hpc_job_id} -h -o %t"
         stdout, _ = self.execute_command(command)
         status = stdout.strip()
@@ -112,17 +264,87 @@ class HPCInteraction:
                 return 'failed'
         
         else:
-            map = {
-                'R': 'running',
-                'PD': 'pending',
-                'CG': 'completed',
-                'F': 'failed'
-            }
-            status = map.get(status, 'unknown')
+            status = SQUEUE_STATES.get(status, 'unknown')
         logger.info(f"Job {hpc_job_id} status: {status}")
         
         return status
 
+    def check_jobs_status(self, hpc_job_ids):
+        """Status for many slurm jobs with one squeue and at most one sacct call.
+
+        Returns a dict of hpc job id (str) to status, using the same vocabulary
+        as `check_job_status`.
+        """
+        hpc_job_ids = [str(i) for i in hpc_job_ids if i is not None]
+        if not hpc_job_ids:
+            return {}
+        results = self._agent_call([{'op': 'stat', 'job_ids': hpc_job_ids}])
+        if results is not None and results[0]['ok']:
+            return results[0]['statuses']
+
+        statuses = {}
+        stdout, _ = self.execute_command(f"squeue -j {','.join(hpc_job_ids)} -h -o '%i %t'")
+        for line in stdout.splitlines():
+            parts = line.split()
+            if len(parts) == 2:
+                statuses[parts[0]] = SQUEUE_STATES.get(parts[1], 'unknown')
+
+        missing = [i for i in hpc_job_ids if i not in statuses]
+        if missing:
+            # -X keeps only the allocation line, not the job steps
+            stdout, _ = self.execute_command(f"sacct -X -j {','.join(missing)} -o JobID,State -n -P")
+            for line in stdout.splitlines():
+                parts = line.strip().split('|')
+                if len(parts) == 2 and parts[0] in missing:
+                    statuses[parts[0]] = parts[1].split()[0].lower()
+            for i in missing:
+                statuses.setdefault(i, 'failed')
+        return statuses
+
+    def read_files(self, remote_paths):
+        """Content of many remote text files, missing ones are left out."""
+        if not remote_paths:
+            return {}
+        results = self._agent_call([{'op': 'read', 'paths': list(remote_paths)}])
+        if results is not None and results[0]['ok']:
+            return results[0]['contents']
+
+        # one command for all files, tail -v prints a "==> path <==" header before each
+        stdout, _ = self.execute_command(f"tail -v -n +1 {' '.join(remote_paths)} 2>/dev/null")
+        contents = {}
+        current = None
+        for line in stdout.splitlines(keepends=True):
+            header = re.fullmatch(r"==> (.*) <==\n?", line)
+            if header is not None and header.group(1) in remote_paths:
+                current = header.group(1)
+                contents[current] = ''
+            elif current is not None:
+                contents[current] += line
+        # tail separates files with an empty line
+        return {path: content[:-1] if content.endswith('\n\n') else content for path, content in contents.items()}
+
+    def read_file(self, remote_path):
+        """Content of a remote text file, None if it does not exist."""
+        return self.read_files([remote_path]).get(remote_path)
+
+    def read_last_lines(self, remote_paths):
+        """Last line of many remote files with one command. Missing or empty files are left out."""
+        if not remote_paths:
+            return {}
+        results = self._agent_call([{'op': 'tail', 'paths': list(remote_paths)}])
+        if results is not None and results[0]['ok']:
+            return results[0]['lines']
+
+        paths = ' '.join(remote_paths)
+        command = f'for f in {paths}; do if [ -s "$f" ]; then printf "%s\\t%s\\n" "$f" "$(tail -n 1 "$f")"; fi; done'
+        stdout, _ = self.execute_command(command)
+        lines = {}
+        for line in stdout.splitlines():
+            path, _, last = line.partition('\t')
+            if last:
+                lines[path] = last
+        return lines
+
     def retrieve_results(self, job, slurm_submission=None):
         if not self.client:
             self.connect()
@@ -138,7 +360,54 @@ class HPCInteraction:
             local_output = f"{self.local_working_directory}/results/{job.output_filename}"
             scp.get(remote_output, local_output)
             logger.info(f"Retrieved {remote_output} to {local_output}")
-    
+
+    def download_output(self, job, local_path, progress=None):
+        """Copy the output archive of a job to `local_path`.
+
+        Params
+        ------
+        job: Job
+        local_path: str
+        progress: callable, optional
+            Called by scp as progress(filename, size, sent) while the file is copied.
+        """
+        self.connect()
+        remote_output = f"{self.remote_working_directory}/{job.job_id}/{job.output_filename}"
+        # one scp channel per call, so several downloads can share the connection
+        with SCPClient(self.client.get_transport(), progress=progress) as scp:
+            scp.get(remote_output, local_path)
+        logger.info(f"Downloaded {remote_output} to {local_path}")
+
+    def _remote_job_directories(self, job_ids):
+        # job ids come from the database, guard against ever expanding to the root of the working directory
+        if not self.remote_working_directory.strip('/'):
+            raise ValueError("Refusing to operate on an empty remote working directory")
+        return [f"{self.remote_working_directory}/{int(job_id)}" for job_id in job_ids]
+
+    def get_remote_directory_sizes(self, job_ids):
+        """Disk usage in bytes of the remote job directories, with one du call. Missing directories are left out."""
+        if not job_ids:
+            return {}
+        directories = self._remote_job_directories(job_ids)
+        results = self._agent_call([{'op': 'du', 'paths': directories}])
+        if results is not None and results[0]['ok']:
+            return {int(os.path.basename(path)): size for path, size in results[0]['sizes'].items()}
+
+        stdout, _ = self.execute_command(f"du -sk {' '.join(directories)} 2>/dev/null")
+        sizes = {}
+        for line in stdout.splitlines():
+            parts = line.split()
+            if len(parts) == 2:
+                sizes[int(os.path.basename(parts[1].rstrip('/')))] = int(parts[0]) * 1024
+        return sizes
+
+    def remove_remote_directories(self, job_ids):
+        if not job_ids:
+            return
+        directories = self._remote_job_directories(job_ids)
+        self.execute_command(f"rm -rf {' '.join(directories)}")
+        logger.info(f"Removed remote directories {directories}")
+
     def get_carbon_footprint(self, job):
         command = get_emissions_command_from_job(self.remote_working_directory, job)
         stdout, _ = self.execute_command(command)
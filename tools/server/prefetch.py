@@ -0,0 +1,229 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Local cache of result archives, filled in the background after jobs complete.
+
+Completed jobs are downloaded by a background duty, a few at a time, with a
+shared bandwidth limit and optionally only inside an off-peak window, so the
+download link serves a local file instead of waiting for scp. The cache is
+bounded in size, the least recently used archives are evicted to make room.
+'''
+import os
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from tools.server.retention import GB
+
+import logging
+logger = logging.getLogger(__name__)
+
+MB = 1024 ** 2
+
+
+class BandwidthLimiter:
+    """Paces byte counts reported by any number of threads to a shared rate.
+
+    Params
+    ------
+    bytes_per_second: float
+        0 or None for no limit.
+    """
+    def __init__(self, bytes_per_second):
+        self.bytes_per_second = bytes_per_second
+        self._lock = threading.Lock()
+        self._next_free = time.monotonic()
+
+    def consume(self, n_bytes):
+        """Sleep until `n_bytes` more fit under the rate."""
+        if not self.bytes_per_second or n_bytes <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._next_free = max(self._next_free, now) + n_bytes / self.bytes_per_second
+            wait = self._next_free - now
+        if wait > 0:
+            time.sleep(wait)
+
+    def progress_callback(self):
+        """scp progress callback for one transfer, scp reports the total bytes sent so far."""
+        sent_before = [0]
+
+        def progress(filename, size, sent):
+            self.consume(sent - sent_before[0])
+            sent_before[0] = sent
+        return progress
+
+
+def parse_window(start, end):
+    """Off-peak window from "HH:MM" strings, None if either is empty."""
+    if not start or not end:
+        return None
+    return tuple(datetime.strptime(t.strip(), '%H:%M').time() for t in (start, end))
+
+
+def in_window(window, now):
+    """Whether `now` is inside the window, which may wrap past midnight. Always True without one."""
+    if window is None:
+        return True
+    start, end = window
+    if start <= end:
+        return start <= now.time() < end
+    return now.time() >= start or now.time() < end
+
+
+def sha256sum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(MB), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ResultPrefetcher:
+    """
+    Params
+    ------
+    hpc: HPCInteraction
+    local_working_directory: str
+        Archives are cached in its `results` subdirectory.
+    max_cache_gb: float
+        Archives are evicted, least recently used first, to stay under this.
+    max_concurrent: int
+        Downloads running at once in a prefetch pass.
+    bandwidth_mbps: float
+        Shared limit of background downloads in MB/s, 0 for none. Downloads a user waits for are not limited.
+    offpeak_start, offpeak_end: str
+        "HH:MM" window background downloads are restricted to, empty for any time.
+    max_age_days: float
+        Only jobs completed this recently are prefetched.
+    verify_checksum: bool
+        Compare downloads against the sha256 reported by the job's sentinel.
+    """
+    def __init__(
+            self,
+            hpc,
+            local_working_directory,
+            max_cache_gb=50.0,
+            max_concurrent=2,
+            bandwidth_mbps=0.0,
+            offpeak_start='',
+            offpeak_end='',
+            max_age_days=2.0,
+            verify_checksum=True
+    ):
+        self.hpc = hpc
+        self.cache_directory = os.path.join(local_working_directory, 'results')
+        self.max_cache_bytes = max_cache_gb * GB
+        self.max_concurrent = max_concurrent
+        self.limiter = BandwidthLimiter(bandwidth_mbps * MB)
+        self.window = parse_window(offpeak_start, offpeak_end)
+        self.max_age_days = max_age_days
+        self.verify_checksum = verify_checksum
+        self._evict_lock = threading.Lock()
+
+    def cache_path(self, job):
+        return os.path.join(self.cache_directory, job.output_filename)
+
+    def cached(self, job):
+        """Path of the cached archive, marked as used, or None if it is not cached."""
+        path = self.cache_path(job)
+        if not os.path.isfile(path):
+            return None
+        # eviction goes by modification time, so serving a file keeps it
+        os.utime(path)
+        return path
+
+    def _cache_entries(self):
+        entries = []
+        for name in os.listdir(self.cache_directory):
+            path = os.path.join(self.cache_directory, name)
+            # placeholders and downloads in progress are not cache entries
+            if name.startswith('.') or name.endswith('.part') or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            entries.append((path, datetime.fromtimestamp(stat.st_mtime), stat.st_size))
+        return entries
+
+    def evict(self, incoming_bytes=0):
+        """Remove least recently used archives until `incoming_bytes` more fit. Returns the removed paths."""
+        with self._evict_lock:
+            entries = sorted(self._cache_entries(), key=lambda e: e[1])
+            total = sum(size for _, _, size in entries)
+            remove = []
+            for path, _, size in entries:
+                if total + incoming_bytes <= self.max_cache_bytes:
+                    break
+                os.remove(path)
+                remove.append(path)
+                total -= size
+        if remove:
+            logger.info(f"Evicted {len(remove)} archives from the result cache")
+        return remove
+
+    def fetch(self, job, throttle=False):
+        """Download the archive of a completed job into the cache. Returns the local path.
+
+        The file only appears under its final name once complete and verified.
+        """
+        os.makedirs(self.cache_directory, exist_ok=True)
+        self.evict(job.output_size or 0)
+        path = self.cache_path(job)
+        # unique per thread, a user download may race the background one for the same job
+        partial = f"{path}.{threading.get_ident()}.part"
+        progress = self.limiter.progress_callback() if throttle else None
+        try:
+            self.hpc.download_output(job, partial, progress=progress)
+            if self.verify_checksum and job.output_sha256:
+                checksum = sha256sum(partial)
+                if checksum != job.output_sha256:
+                    raise ValueError(f"Checksum mismatch for job {job.job_id}: expected {job.output_sha256}, got {checksum}")
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        return path
+
+    def get(self, db, job):
+        """Local path of a completed job's archive, downloaded now if it is not cached."""
+        path = self.cached(job)
+        if path is None:
+            path = self.fetch(job)
+            db.mark_results_cached(job.job_id)
+        return path
+
+    def run(self, db):
+        """Prefetch recently completed jobs. Run as a background duty. Returns the job ids cached."""
+        if not in_window(self.window, datetime.now()):
+            return []
+        since = datetime.now() - timedelta(days=self.max_age_days)
+        jobs = db.get_jobs(db.get_jobs_to_prefetch(since))
+        if not jobs:
+            return []
+
+        def prefetch(job):
+            if self.cached(job):
+                return job.job_id
+            if (job.output_size or 0) > self.max_cache_bytes:
+                logger.warning(f"Results of job {job.job_id} are larger than the result cache, not prefetched")
+                return None
+            try:
+                self.fetch(job, throttle=True)
+                return job.job_id
+            except Exception:
+                logger.exception(f"Could not prefetch results of job {job.job_id}")
+                return None
+
+        # sqlite connections stay in their thread, so only downloads run in
+        # parallel and bookkeeping is done here
+        with ThreadPoolExecutor(max_workers=self.max_concurrent) as pool:
+            done = [job_id for job_id in pool.map(prefetch, jobs) if job_id is not None]
+        for job_id in done:
+            db.mark_results_cached(job_id)
+        logger.info(f"Prefetched results of {len(done)} jobs")
+        return done
@@ -0,0 +1,96 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Progress tracking of running jobs.
+
+Job scripts append a record to `progress.csv` in their remote working directory
+after every item (see `SlurmSubmission._progress_preamble`). The poller reads
+the last record of every active job with a single remote command, and stores
+throughput and ETA estimates.
+'''
+from datetime import datetime
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def parse_progress_record(line):
+    """Parse "items_done,items_this_run,item_seconds,elapsed_seconds,unix_time"."""
+    items_done, items_this_run, item_seconds, elapsed_seconds, timestamp = line.strip().split(',')
+    return {
+        'items_done': int(items_done),
+        'items_this_run': int(items_this_run),
+        'item_seconds': float(item_seconds),
+        'elapsed_seconds': float(elapsed_seconds),
+        'record_time': datetime.fromtimestamp(int(timestamp)),
+    }
+
+
+def estimate(progress, total_items):
+    """Add items per hour and seconds remaining to a parsed progress record.
+
+    Throughput only counts items done by the current run, so items skipped
+    after a restart do not inflate it.
+    """
+    throughput = None
+    eta_seconds = None
+    if progress['elapsed_seconds'] > 0 and progress['items_this_run'] > 0:
+        throughput = progress['items_this_run'] / progress['elapsed_seconds'] * 3600
+        if total_items is not None:
+            remaining = max(total_items - progress['items_done'], 0)
+            eta_seconds = remaining / throughput * 3600
+    progress['throughput'] = throughput
+    progress['eta_seconds'] = eta_seconds
+    return progress
+
+
+def is_stalled(progress, stall_factor=3.0, now=None):
+    """True if no item finished for `stall_factor` times the average item duration."""
+    if progress is None or not progress.get('throughput'):
+        return False
+    now = now or datetime.now()
+    seconds_per_item = 3600 / progress['throughput']
+    return (now - progress['record_time']).total_seconds() > stall_factor * seconds_per_item
+
+
+class ProgressPoller:
+    """
+    Params
+    ------
+    hpc: HPCInteraction
+    stall_factor: float
+        Jobs silent for this many average item durations are logged as stalled.
+    """
+    def __init__(self, hpc, stall_factor=3.0):
+        self.hpc = hpc
+        self.stall_factor = stall_factor
+
+    def progress_path(self, job_id):
+        return f"{self.hpc.remote_working_directory}/{job_id}/progress.csv"
+
+    def poll(self, db):
+        """Refresh progress of all active jobs. Returns the number of jobs updated."""
+        active = db.get_active_jobs()
+        if not active:
+            return 0
+        paths = {self.progress_path(job_id): job_id for job_id, _ in active}
+        last_lines = self.hpc.read_last_lines(list(paths))
+
+        updated = 0
+        for path, line in last_lines.items():
+            job_id = paths[path]
+            try:
+                progress = parse_progress_record(line)
+            except ValueError:
+                logger.warning(f"Malformed progress record for job {job_id}: {line}")
+                continue
+            job = db.get_job(job_id)
+            progress = estimate(progress, job.total_items)
+            db.update_progress(job_id, progress)
+            if is_stalled(progress, self.stall_factor):
+                logger.warning(f"Job {job_id} looks stalled, last item finished at {progress['record_time']}")
+            updated += 1
+        return updated
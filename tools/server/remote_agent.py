@@ -0,0 +1,193 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Agent run on the cluster login node, see tools/server/agent.py.
+
+Only uses the standard library since it runs with whatever python3 the login
+node has. It reads framed requests on stdin and writes framed responses on
+stdout until stdin closes. A frame is a 4 byte big endian length followed by
+that many bytes of UTF-8 JSON.
+
+Request:  {"id": 1, "ops": [{"op": "sbatch", "script": "/path/job.sh"}, ...]}
+Response: {"id": 1, "results": [{"ok": true, "job_id": "123"}, ...]}
+
+Every op in a batch gets a result, a failing op does not stop the others.
+'''
+import os
+import sys
+import json
+import struct
+import subprocess
+
+SQUEUE_STATES = {
+    'R': 'running',
+    'PD': 'pending',
+    'CF': 'pending',
+    'CG': 'completed',
+    'F': 'failed',
+    'PR': 'preempted',
+    'TO': 'timeout',
+    'NF': 'node_fail',
+}
+
+
+def read_frame(stream):
+    header = stream.read(4)
+    if len(header) < 4:
+        return None
+    (length,) = struct.unpack('>I', header)
+    payload = stream.read(length)
+    if len(payload) < length:
+        return None
+    return json.loads(payload.decode('utf-8'))
+
+
+def write_frame(stream, message):
+    payload = json.dumps(message).encode('utf-8')
+    stream.write(struct.pack('>I', len(payload)) + payload)
+    stream.flush()
+
+
+def _run(args, shell=False):
+    proc = subprocess.run(args, shell=shell, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return proc.returncode, proc.stdout.decode('utf-8', 'replace'), proc.stderr.decode('utf-8', 'replace')
+
+
+def op_run(request):
+    """Shell command, for anything without a dedicated op."""
+    returncode, stdout, stderr = _run(request['cmd'], shell=True)
+    return {'returncode': returncode, 'stdout': stdout, 'stderr': stderr}
+
+
+def op_sbatch(request):
+    args = ['sbatch', '--parsable']
+    if request.get('dependency'):
+        args += [f"--dependency=afterok:{request['dependency']}", '--kill-on-invalid-dep=yes']
+    args.append(request['script'])
+    returncode, stdout, stderr = _run(args)
+    # --parsable prints "jobid" or "jobid;cluster"
+    job_id = stdout.strip().split(';')[0]
+    if returncode != 0 or not job_id.isdigit():
+        return {'ok': False, 'error': stderr.strip() or stdout.strip() or 'no output from sbatch'}
+    return {'job_id': job_id}
+
+
+def op_sbatch_chain(request):
+    """Submit scripts so each depends on the previous one, cancelling all if one fails."""
+    job_ids = []
+    for script in request['scripts']:
+        result = op_sbatch({'script': script, 'dependency': job_ids[-1] if job_ids else None})
+        if not result.get('ok', True):
+            for job_id in job_ids:
+                _run(['scancel', job_id])
+            return result
+        job_ids.append(result['job_id'])
+    return {'job_ids': job_ids}
+
+
+def op_stat(request):
+    job_ids = [str(i) for i in request['job_ids']]
+    statuses = {}
+    if not job_ids:
+        return {'statuses': statuses}
+    _, stdout, _ = _run(['squeue', '-j', ','.join(job_ids), '-h', '-o', '%i %t'])
+    for line in stdout.splitlines():
+        parts = line.split()
+        if len(parts) == 2:
+            statuses[parts[0]] = SQUEUE_STATES.get(parts[1], 'unknown')
+    missing = [i for i in job_ids if i not in statuses]
+    if missing:
+        _, stdout, _ = _run(['sacct', '-X', '-j', ','.join(missing), '-o', 'JobID,State', '-n', '-P'])
+        for line in stdout.splitlines():
+            parts = line.strip().split('|')
+            if len(parts) == 2 and parts[0] in missing:
+                statuses[parts[0]] = parts[1].split()[0].lower()
+        for i in missing:
+            statuses.setdefault(i, 'failed')
+    return {'statuses': statuses}
+
+
+def op_read(request):
+    """Whole files, missing ones are left out."""
+    contents = {}
+    for path in request['paths']:
+        if os.path.isfile(path):
+            with open(path, 'r', errors='replace') as f:
+                contents[path] = f.read()
+    return {'contents': contents}
+
+
+def _last_line(path):
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        block = b''
+        while position > 0 and block.count(b'\n') < 2:
+            step = min(4096, position)
+            position -= step
+            f.seek(position)
+            block = f.read(step) + block
+    lines = block.decode('utf-8', 'replace').strip().splitlines()
+    return lines[-1] if lines else ''
+
+
+def op_tail(request):
+    """Last line of files, missing and empty ones are left out."""
+    lines = {}
+    for path in request['paths']:
+        if os.path.isfile(path) and os.path.getsize(path) > 0:
+            lines[path] = _last_line(path)
+    return {'lines': lines}
+
+
+def op_du(request):
+    """Disk usage in bytes of directories, missing ones are left out."""
+    sizes = {}
+    existing = [path for path in request['paths'] if os.path.isdir(path)]
+    if existing:
+        _, stdout, _ = _run(['du', '-sk'] + existing)
+        for line in stdout.splitlines():
+            parts = line.split('\t')
+            if len(parts) == 2:
+                sizes[parts[1]] = int(parts[0]) * 1024
+    return {'sizes': sizes}
+
+
+OPS = {
+    'run': op_run,
+    'sbatch': op_sbatch,
+    'sbatch_chain': op_sbatch_chain,
+    'stat': op_stat,
+    'read': op_read,
+    'tail': op_tail,
+    'du': op_du,
+}
+
+
+def handle(request):
+    op = OPS.get(request.get('op'))
+    if op is None:
+        return {'ok': False, 'error': f"unknown op {request.get('op')}"}
+    try:
+        result = op(request)
+    except Exception as e:
+        return {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+    result.setdefault('ok', True)
+    return result
+
+
+def main():
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+    while True:
+        message = read_frame(stdin)
+        if message is None:
+            break
+        write_frame(stdout, {'id': message.get('id'), 'results': [handle(op) for op in message.get('ops', [])]})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Automatic requeue of jobs that hit their wall time or were preempted.
+
+Job scripts mark each finished item (see `SlurmSubmission._checkpoint_preamble`)
+and skip marked items when run again, so resubmitting the same scripts only
+computes the remaining work. Jobs keep their id, only the slurm ids change.
+'''
+from tools.jobs.job_database import RESUMABLE_STATUSES, TERMINAL_STATUSES
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class Requeuer:
+    """
+    Params
+    ------
+    scheduler: SubmissionScheduler
+        Requeued jobs go through admission control like new ones.
+    max_requeues: int
+        Resubmissions allowed per job before a timeout is treated as final.
+    """
+    def __init__(self, scheduler, max_requeues=3):
+        self.scheduler = scheduler
+        self.hpc = scheduler.hpc
+        self.max_requeues = max_requeues
+
+    def resume_point(self, chain, chain_statuses):
+        """Index of the first stage in the chain that did not complete, None if one failed for good."""
+        for index, link in enumerate(chain):
+            status = chain_statuses.get(str(link['hpc_job_id']))
+            if status == 'completed':
+                continue
+            if status in RESUMABLE_STATUSES:
+                return index
+            # later stages cancelled through their dependency are never reached,
+            # so anything else here is a genuine failure
+            return None
+        return None
+
+    def handle(self, db, job, status, chain_statuses=None):
+        """Requeue the job if `status` or a stage of its chain allows it. Returns the status to store."""
+        if status not in RESUMABLE_STATUSES and (status not in TERMINAL_STATUSES or status == 'completed'):
+            return status
+        chain = job.hpc_job_chain or [{'script': None, 'hpc_job_id': job.hpc_job_id}]
+        if chain_statuses is None:
+            chain_statuses = self.hpc.check_jobs_status([link['hpc_job_id'] for link in chain])
+        chain_statuses = dict(chain_statuses)
+        chain_statuses.setdefault(str(job.hpc_job_id), status)
+
+        start = self.resume_point(chain, chain_statuses)
+        if start is None or chain[start]['script'] is None:
+            return status
+        if job.requeue_count >= self.max_requeues:
+            logger.warning(f"Job {job.job_id} ended with {status} but was already requeued {job.requeue_count} times")
+            return status
+
+        scripts = [link['script'] for link in chain[start:]]
+        self.scheduler.enqueue(db, job, scripts, job.account)
+        db.increment_requeue_count(job.job_id)
+        logger.info(f"Requeued job {job.job_id} from stage {start} after {chain_statuses.get(str(chain[start]['hpc_job_id']))}")
+        return 'queued'
@@ -0,0 +1,117 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Garbage collection of job directories on the cluster and local working files.
+
+Only directories of finished jobs are touched on the cluster. Anything older
+than the age limit is removed, then the oldest remaining ones until the total
+is under the size limit.
+'''
+import os
+from datetime import datetime, timedelta
+
+import logging
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+
+
+def select_for_removal(entries, max_age_days, max_size_bytes, now):
+    """Pick entries to delete under an age and total size policy.
+
+    Params
+    ------
+    entries: list of (key, last_modified datetime, size in bytes)
+    max_age_days: float
+        Entries older than this are always removed.
+    max_size_bytes: float
+        After removing old entries, the oldest are removed until the total fits.
+    now: datetime
+
+    Returns the keys to remove.
+    """
+    cutoff = now - timedelta(days=max_age_days)
+    entries = sorted(entries, key=lambda e: e[1])
+    remove = [key for key, modified, _ in entries if modified < cutoff]
+    kept = [(key, size) for key, modified, size in entries if modified >= cutoff]
+    total = sum(size for _, size in kept)
+    for key, size in kept:
+        if total <= max_size_bytes:
+            break
+        remove.append(key)
+        total -= size
+    return remove
+
+
+class GarbageCollector:
+    """
+    Params
+    ------
+    hpc: HPCInteraction
+    local_working_directory: str
+        Its `submissions` subdirectory is pruned. `results` is the result cache,
+        evicted by `ResultPrefetcher` only.
+    remote_max_age_days, remote_max_size_gb: float
+        Policy for job directories on the cluster.
+    local_max_age_days, local_max_size_gb: float
+        Policy for local files.
+    """
+    def __init__(
+            self,
+            hpc,
+            local_working_directory,
+            remote_max_age_days=30.0,
+            remote_max_size_gb=500.0,
+            local_max_age_days=7.0,
+            local_max_size_gb=50.0
+    ):
+        self.hpc = hpc
+        self.local_directories = [
+            os.path.join(local_working_directory, 'submissions'),
+        ]
+        self.remote_max_age_days = remote_max_age_days
+        self.remote_max_size_bytes = remote_max_size_gb * GB
+        self.local_max_age_days = local_max_age_days
+        self.local_max_size_bytes = local_max_size_gb * GB
+
+    def prune_remote(self, db):
+        """Remove remote directories of finished jobs. Returns the pruned job ids."""
+        candidates = db.get_jobs_to_clean()
+        if not candidates:
+            return []
+        sizes = self.hpc.get_remote_directory_sizes([job_id for job_id, _ in candidates])
+        # directories that are already gone only need to be marked
+        missing = [job_id for job_id, _ in candidates if job_id not in sizes]
+        entries = [(job_id, updated, sizes[job_id]) for job_id, updated in candidates if job_id in sizes]
+        remove = select_for_removal(entries, self.remote_max_age_days, self.remote_max_size_bytes, datetime.now())
+
+        self.hpc.remove_remote_directories(remove)
+        db.mark_remote_cleaned(remove + missing)
+        logger.info(f"Pruned {len(remove)} remote job directories")
+        return remove
+
+    def prune_local(self):
+        """Remove old local job scripts. Returns the removed paths."""
+        entries = []
+        for directory in self.local_directories:
+            if not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                # keep the placeholders that keep the directories in git
+                if name.startswith('.') or not os.path.isfile(path):
+                    continue
+                stat = os.stat(path)
+                entries.append((path, datetime.fromtimestamp(stat.st_mtime), stat.st_size))
+        remove = select_for_removal(entries, self.local_max_age_days, self.local_max_size_bytes, datetime.now())
+        for path in remove:
+            os.remove(path)
+        logger.info(f"Pruned {len(remove)} local files")
+        return remove
+
+    def run(self, db):
+        self.prune_local()
+        self.prune_remote(db)
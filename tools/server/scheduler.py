@@ -0,0 +1,186 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Local admission control in front of sbatch.
+
+Staged jobs are put in the `submission_queue` table instead of being submitted
+right away. The scheduler releases them to slurm while respecting per user and
+per account concurrency quotas, ordering users by weighted fair share, spacing
+out sbatch calls and backing off when slurm pushes back.
+'''
+import time
+import threading
+from datetime import datetime, timedelta
+
+from tools.jobs.job_database import JobStatus
+from tools.server.hpc import SubmissionError
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def parse_user_weights(weights):
+    """Parse "user1:2,user2:0.5" into a dict of fair share weights."""
+    parsed = {}
+    if not weights:
+        return parsed
+    for entry in weights.split(','):
+        entry = entry.strip()
+        if not entry:
+            continue
+        user, weight = entry.split(':')
+        weight = float(weight)
+        # shares are divided by the weight
+        if not weight > 0:
+            raise ValueError(f"Fair share weight of {user.strip()} must be positive, got {weight}")
+        parsed[user.strip()] = weight
+    return parsed
+
+
+class SubmissionScheduler:
+    """Fair share scheduler that owns all sbatch calls made by the server.
+
+    Params
+    ------
+    hpc: HPCInteraction
+        Used to submit the staged scripts.
+    max_jobs_per_user: int
+        Number of pending or running jobs a single user may have on the cluster.
+    max_jobs_per_account: int
+        Number of pending or running jobs across all users of a slurm account.
+    user_weights: dict
+        Fair share weight per user, users not listed get `default_weight`.
+    min_submit_interval: float
+        Minimum seconds between two sbatch calls.
+    max_retries: int
+        Transient sbatch failures tolerated before the job is marked failed.
+    backoff_base: float
+        Seconds to wait after the first transient failure, doubled on each retry.
+    max_backoff: float
+        Upper bound on the wait between retries.
+    """
+    def __init__(
+            self,
+            hpc,
+            max_jobs_per_user=10,
+            max_jobs_per_account=50,
+            user_weights=None,
+            default_weight=1.0,
+            min_submit_interval=1.0,
+            max_retries=5,
+            backoff_base=30.0,
+            max_backoff=1800.0
+    ):
+        self.hpc = hpc
+        self.max_jobs_per_user = max_jobs_per_user
+        self.max_jobs_per_account = max_jobs_per_account
+        self.user_weights = user_weights or {}
+        self.default_weight = default_weight
+        self.min_submit_interval = min_submit_interval
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self._last_submit = 0.0
+        self._lock = threading.Lock()
+
+    def enqueue(self, db, job, scripts, account):
+        """Queue a staged job for submission. `scripts` are remote script paths in dependency order."""
+        db.add_to_queue(job, scripts, account)
+        logger.info(f"Queued job {job.job_id} for user {job.user_id}")
+
+    def weight(self, user_id):
+        return self.user_weights.get(user_id, self.default_weight)
+
+    def _order(self, queue, user_counts, respect_quotas=True, account_counts=None):
+        """Yield queue entries in fair share order.
+
+        The user with the lowest active jobs / weight goes next, oldest entry
+        first within a user. Counts are updated as entries are yielded so a
+        burst from one user interleaves with everyone else.
+        """
+        user_counts = dict(user_counts)
+        account_counts = dict(account_counts or {})
+        by_user = {}
+        for entry in queue:
+            by_user.setdefault(entry['user_id'], []).append(entry)
+
+        while by_user:
+            candidates = []
+            for user_id, entries in by_user.items():
+                if respect_quotas:
+                    if user_counts.get(user_id, 0) >= self.max_jobs_per_user:
+                        continue
+                    entries = [
+                        e for e in entries
+                        if account_counts.get(e['account'], 0) < self.max_jobs_per_account
+                    ]
+                    if not entries:
+                        continue
+                share = user_counts.get(user_id, 0) / self.weight(user_id)
+                candidates.append((share, entries[0]['enqueue_time'], user_id, entries[0]))
+            if not candidates:
+                return
+            _, _, user_id, entry = min(candidates, key=lambda c: (c[0], str(c[1])))
+            by_user[user_id].remove(entry)
+            if not by_user[user_id]:
+                del by_user[user_id]
+            user_counts[user_id] = user_counts.get(user_id, 0) + 1
+            account_counts[entry['account']] = account_counts.get(entry['account'], 0) + 1
+            yield entry
+
+    def queue_position(self, db, job_id):
+        """Estimated 1-based position of a queued job, ignoring quotas. None if not queued."""
+        queue = db.get_queue()
+        user_counts = db.count_active_jobs('user_id')
+        for position, entry in enumerate(self._order(queue, user_counts, respect_quotas=False), start=1):
+            if entry['job_id'] == job_id:
+                return position
+        return None
+
+    def _rate_limit(self):
+        wait = self.min_submit_interval - (time.monotonic() - self._last_submit)
+        if wait > 0:
+            time.sleep(wait)
+        self._last_submit = time.monotonic()
+
+    def dispatch(self, db):
+        """Submit as many queued jobs as the quotas allow. Returns the number submitted."""
+        with self._lock:
+            now = datetime.now()
+            queue = [entry for entry in db.get_queue() if entry['next_attempt'] <= now]
+            user_counts = db.count_active_jobs('user_id')
+            account_counts = db.count_active_jobs('account')
+
+            submitted = 0
+            for entry in self._order(queue, user_counts, account_counts=account_counts):
+                self._rate_limit()
+                try:
+                    hpc_job_ids = self.hpc.submit_scripts(entry['scripts'])
+                except SubmissionError as e:
+                    self._handle_failure(db, entry, e)
+                    if e.transient:
+                        # slurm is pushing back, stop hammering it this round
+                        break
+                    continue
+                # the last job of the chain tracks the job as a whole
+                db.update_job_hpc_id(entry['job_id'], hpc_job_ids[-1])
+                db.update_job_hpc_chain(entry['job_id'], entry['scripts'], hpc_job_ids)
+                db.update_job_status(entry['job_id'], JobStatus.PENDING.value)
+                db.remove_from_queue(entry['job_id'])
+                logger.info(f"Dispatched job {entry['job_id']} as HPC jobs {hpc_job_ids}")
+                submitted += 1
+            return submitted
+
+    def _handle_failure(self, db, entry, error):
+        attempts = entry['attempts'] + 1
+        if not error.transient or attempts > self.max_retries:
+            logger.error(f"Giving up on job {entry['job_id']} after {attempts} attempt(s): {error}")
+            db.remove_from_queue(entry['job_id'])
+            db.update_job_status(entry['job_id'], JobStatus.FAILED.value)
+            return
+        delay = min(self.backoff_base * 2 ** (attempts - 1), self.max_backoff)
+        logger.warning(f"Transient sbatch failure for job {entry['job_id']}, retrying in {delay}s: {error}")
+        db.update_queue_attempt(entry['job_id'], attempts, datetime.now() + timedelta(seconds=delay))
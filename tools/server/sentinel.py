@@ -0,0 +1,127 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Event driven completion detection.
+
+Job scripts atomically write `done.json` when they end (see
+`SlurmSubmission._sentinel_preamble`). The watcher reads the sentinels of all
+active jobs with one remote command per cycle. Slurm is only asked about jobs
+whose sentinel reports a failure, to tell timeouts from errors, and about jobs
+that have not been heard from for a while.
+'''
+import json
+from datetime import datetime
+
+import logging
+logger = logging.getLogger(__name__)
+
+# slurm statuses of a job whose script has already exited but which slurm has not finished accounting for
+SETTLING_STATUSES = ('pending', 'running', 'completed', 'unknown')
+
+
+def parse_sentinel(text):
+    """Parsed done.json, None if missing or malformed."""
+    if not text:
+        return None
+    try:
+        sentinel = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(sentinel, dict) or 'exit_status' not in sentinel:
+        return None
+    return sentinel
+
+
+class SentinelWatcher:
+    """
+    Params
+    ------
+    hpc: HPCInteraction
+    requeuer: Requeuer
+        Decides what happens to jobs that did not complete.
+    completion: CompletionHandler
+        Called once for jobs seen to complete.
+    overdue_after: float
+        Seconds without news after which slurm is asked about a job without a sentinel.
+    """
+    def __init__(self, hpc, requeuer, completion, overdue_after=1800.0):
+        self.hpc = hpc
+        self.requeuer = requeuer
+        self.completion = completion
+        self.overdue_after = overdue_after
+
+    def sentinel_path(self, job_id):
+        return f"{self.hpc.remote_working_directory}/{job_id}/done.json"
+
+    def is_overdue(self, job, now):
+        last_updated = datetime.fromisoformat(str(job.last_updated))
+        return (now - last_updated).total_seconds() > self.overdue_after
+
+    @staticmethod
+    def _chain_ids(job):
+        ids = [str(link['hpc_job_id']) for link in job.hpc_job_chain]
+        if job.hpc_job_id is not None and str(job.hpc_job_id) not in ids:
+            ids.append(str(job.hpc_job_id))
+        return ids
+
+    def _complete(self, db, job, sentinel):
+        db.update_job_output(job.job_id, sentinel.get('output_size'), sentinel.get('sha256'))
+        self.completion.handle(db, job)
+        db.update_job_status(job.job_id, 'completed')
+        logger.info(f"Job {job.job_id} completed, reported by sentinel")
+
+    def check_jobs(self, db, jobs):
+        """Update active jobs from their sentinels, asking slurm only where needed."""
+        # requeued jobs keep the slurm ids of their last run until dispatched again
+        jobs = [job for job in jobs if job.hpc_job_id is not None and job.status != 'queued']
+        if not jobs:
+            return
+        now = datetime.now()
+        contents = self.hpc.read_files([self.sentinel_path(job.job_id) for job in jobs])
+
+        failed = {}
+        overdue = []
+        for job in jobs:
+            sentinel = parse_sentinel(contents.get(self.sentinel_path(job.job_id)))
+            # a sentinel left by an earlier run of a requeued job is ignored
+            if sentinel is not None and str(sentinel.get('slurm_job_id')) in self._chain_ids(job):
+                if sentinel['exit_status'] == 0 and sentinel.get('final_stage', True):
+                    try:
+                        self._complete(db, job, sentinel)
+                    except Exception:
+                        # one bad job must not hold up the others, it is retried next cycle
+                        logger.exception(f"Could not complete job {job.job_id}")
+                else:
+                    failed[job.job_id] = sentinel
+            elif self.is_overdue(job, now):
+                overdue.append(job)
+
+        to_check = [job for job in jobs if job.job_id in failed] + overdue
+        if not to_check:
+            return
+        chain_ids = sorted({i for job in to_check for i in self._chain_ids(job)})
+        statuses = self.hpc.check_jobs_status(chain_ids)
+        for job in to_check:
+            status = statuses.get(str(job.hpc_job_id), job.status)
+            if job.job_id in failed and status in SETTLING_STATUSES:
+                # the script failed but slurm has not recorded the final state yet, look again next cycle
+                continue
+            try:
+                self._update(db, job, status, statuses)
+            except Exception:
+                logger.exception(f"Could not update job {job.job_id} to {status}")
+
+    def _update(self, db, job, status, statuses):
+        status = self.requeuer.handle(db, job, status, chain_statuses=statuses)
+        if status == 'completed' and job.status != 'completed':
+            self.completion.handle(db, job)
+        db.update_job_status(job.job_id, status)
+
+    def poll(self, db):
+        """Check all active jobs. Run as a background duty."""
+        active = db.get_active_jobs()
+        if active:
+            self.check_jobs(db, db.get_jobs([job_id for job_id, _ in active]))
@@ -0,0 +1,76 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Per process server state, built from the config by the app factory.
+'''
+import os
+
+from tools.server.hpc import HPCInteraction
+from tools.server.scheduler import SubmissionScheduler, parse_user_weights
+from tools.server.retention import GarbageCollector
+from tools.server.progress import ProgressPoller
+from tools.server.resume import Requeuer
+from tools.server.completion import CompletionHandler
+from tools.server.sentinel import SentinelWatcher
+from tools.server.prefetch import ResultPrefetcher
+from tools.server.workers import BackgroundWorkers
+
+
+class Services:
+    """Everything the request handlers and background duties share.
+
+    Stored on the Flask app as `app.extensions['kestrel']`.
+    """
+    def __init__(self, config):
+        self.config = config
+        self.hpc = HPCInteraction(**config.get_hpc_config())
+        self.completion = CompletionHandler(self.hpc)
+
+        scheduler_config = config.get_scheduler_config()
+        dispatch_interval = scheduler_config.pop('dispatch_interval')
+        scheduler_config['user_weights'] = parse_user_weights(scheduler_config['user_weights'])
+        self.scheduler = SubmissionScheduler(self.hpc, **scheduler_config)
+
+        retention_config = config.get_retention_config()
+        gc_interval = retention_config.pop('gc_interval')
+        self.garbage_collector = GarbageCollector(
+            self.hpc,
+            config.get('HPC', 'local_working_directory'),
+            **retention_config
+        )
+
+        progress_config = config.get_progress_config()
+        poll_interval = progress_config.pop('poll_interval')
+        self.progress_poller = ProgressPoller(self.hpc, **progress_config)
+
+        self.requeuer = Requeuer(self.scheduler, **config.get_resume_config())
+
+        sentinel_config = config.get_sentinel_config()
+        sentinel_interval = sentinel_config.pop('poll_interval')
+        self.watcher = SentinelWatcher(self.hpc, self.requeuer, self.completion, **sentinel_config)
+
+        prefetch_config = config.get_prefetch_config()
+        prefetch_enabled = prefetch_config.pop('enabled')
+        prefetch_interval = prefetch_config.pop('interval')
+        # also serves downloads from the cache when background prefetching is off
+        self.prefetcher = ResultPrefetcher(
+            self.hpc,
+            config.get('HPC', 'local_working_directory'),
+            **prefetch_config
+        )
+
+        lock_path = config.get(
+            'Server',
+            'leader_lock',
+            fallback=os.path.join(config.get('HPC', 'local_working_directory'), 'leader.lock')
+        )
+        self.workers = BackgroundWorkers(config.get_database_path(), lock_path)
+        self.workers.add('submission-scheduler', self.scheduler.dispatch, dispatch_interval)
+        self.workers.add('garbage-collector', self.garbage_collector.run, gc_interval)
+        self.workers.add('progress-poller', self.progress_poller.poll, poll_interval)
+        self.workers.add('sentinel-watcher', self.watcher.poll, sentinel_interval)
+        if prefetch_enabled:
+            self.workers.add('result-prefetcher', self.prefetcher.run, prefetch_interval)
@@ -0,0 +1,121 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Periodic background duties with leader election across server processes.
+
+Under a multi worker WSGI server every process builds the app, but duties such
+as sbatch dispatch and garbage collection must run exactly once. Each process
+tries to take an exclusive file lock; the one that holds it runs the duties and
+the others keep retrying, so a new leader takes over if the old one dies.
+'''
+import os
+import fcntl
+import threading
+
+from tools.jobs.job_database import JobDatabase
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    """Exclusive, non blocking lock on a file shared by all server processes.
+
+    The operating system releases it when the holding process exits.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        """Try to become leader. Returns True if this process holds the lock."""
+        if self._file is not None:
+            return True
+        f = open(self.path, 'a+')
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+    @property
+    def is_leader(self):
+        return self._file is not None
+
+
+class BackgroundWorkers:
+    """
+    Params
+    ------
+    db_path: str
+        Each duty gets its own database connection, sqlite connections cannot
+        be shared across threads.
+    lock_path: str
+        File used for leader election.
+    election_interval: float
+        Seconds between attempts to become leader.
+    """
+    def __init__(self, db_path, lock_path, election_interval=30.0):
+        self.db_path = db_path
+        self.lock = LeaderLock(lock_path)
+        self.election_interval = election_interval
+        self.duties = []
+        self._threads = []
+        self._stop = threading.Event()
+
+    def add(self, name, func, interval):
+        """Register `func(db)` to be called every `interval` seconds by the leader."""
+        self.duties.append((name, func, interval))
+
+    def _run_duty(self, name, func, interval):
+        db = JobDatabase(self.db_path)
+        try:
+            while not self._stop.is_set():
+                try:
+                    func(db)
+                except Exception:
+                    logger.exception(f"Background duty {name} failed")
+                self._stop.wait(interval)
+        finally:
+            db.close()
+
+    def _elect(self):
+        while not self._stop.is_set():
+            if self.lock.acquire():
+                logger.info(f"Process {os.getpid()} is leader, starting {[d[0] for d in self.duties]}")
+                for name, func, interval in self.duties:
+                    thread = threading.Thread(target=self._run_duty, args=(name, func, interval), name=name, daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+                return
+            self._stop.wait(self.election_interval)
+
+    def start(self):
+        """Start trying to become leader without blocking the caller."""
+        if self._threads:
+            return
+        thread = threading.Thread(target=self._elect, name='leader-election', daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.lock.release()
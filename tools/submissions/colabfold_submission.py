@@ -13,6 +13,9 @@ class ColabFold2Submission(SlurmSubmission):
     def __init__(self, fasta_file_path, **kwargs):
         super().__init__(**kwargs)
         self.add_file_transfer(fasta_file_path, f"{self.remote_working_directory}/input.fasta")
+        self.add_summarizer()
+        with open(fasta_file_path, 'r') as f:
+            self.total_items = sum(1 for line in f if line.startswith('>'))
 
     def _generate_header(self):
         """We have two headers - one for search and one for inference."""
@@ -42,14 +45,49 @@ SBATCH --output={self.remote_working_directory}/inference.out
         """Also two scripts, one for inference and one for search."""
 
         search_script = f"""
-module load gcc
-/projects/proteinml/software/colabfold_code/submit_search.sh {self.remote_working_directory}/input.fasta {self.remote_working_directory}/search
+# the search is only rerun if an earlier run did not finish it
+if ! item_done search; then
+    module load gcc
+    /projects/proteinml/software/colabfold_code/submit_search.sh {self.work_directory}/input.fasta {self.work_directory}/search || exit 1
+    {self.stage_back('search')}
+    mark_done search
+fi
 """
         
         inference_script = f"""
-/projects/proteinml/software/colabfold_code/submit_loop_inference.sh {self.remote_working_directory}/search {self.remote_working_directory}/inference
+# colabfold skips queries that have a .done.txt, so an interrupted run resumes from its outputs
+{self.restore_checkpoint('inference')}
+
+# colabfold writes a .done.txt per finished query, report them as they appear.
+# Queries finished by an earlier run count as done but not towards this run's throughput.
+START_DONE=$(ls {self.work_directory}/inference/*.done.txt 2>/dev/null | wc -l)
+watch_progress() {{
+    local LAST=$START_DONE
+    local LAST_TIME=$(date +%s)
+    while true; do
+        local DONE=$(ls {self.work_directory}/inference/*.done.txt 2>/dev/null | wc -l)
+        if [ "$DONE" -gt "$LAST" ]; then
+            local NOW=$(date +%s)
+            record_progress $DONE $((DONE - START_DONE)) $(( (NOW - LAST_TIME) / (DONE - LAST) ))
+            {self.sync_checkpoint('inference')}
+            LAST=$DONE
+            LAST_TIME=$NOW
+        fi
+        sleep 60
+    done
+}}
+watch_progress &
+PROGRESS_PID=$!
+
+/projects/proteinml/software/colabfold_code/submit_loop_inference.sh {self.remote_working_directory}/search {self.work_directory}/inference
+kill $PROGRESS_PID
+DONE=$(ls {self.work_directory}/inference/*.done.txt 2>/dev/null | wc -l)
+record_progress $DONE $((DONE - START_DONE)) 0
+
+# per query pLDDT and pTM, fetched by the server so users can triage without downloading
+{self.summarize_results('colabfold', f'{self.work_directory}/inference')}
 
 # zip up the results
-tar -czvf {self.remote_working_directory}/{self.get_output_filename()} {self.remote_working_directory}/inference
+tar -czvf {self.remote_working_directory}/{self.get_output_filename()} -C {self.work_directory} inference && {self.clear_checkpoints()}
 """
         return [search_script, inference_script]
@@ -10,11 +10,17 @@ Wrapper for neuralplexer submission.
 from tools.submissions.slurm_submission import SlurmSubmission
 
 class NeuralplexerSubmission(SlurmSubmission):
+    supports_env_image = True
+
     def __init__(self, csv_path, zip_path, **kwargs):
         super().__init__(**kwargs)
         self.add_file_transfer(csv_path, f"{self.remote_working_directory}/input.csv")
         if zip_path:
             self.add_file_transfer(zip_path, f"{self.remote_working_directory}/pdb_files.zip")
+        self.add_summarizer()
+        with open(csv_path, 'r') as f:
+            # skip the header
+            self.total_items = max(sum(1 for line in f if line.strip()) - 1, 0)
 
     def _generate_header(self):
         script = f"""#!/bin/bash
@@ -32,12 +38,11 @@ class NeuralplexerSubmission(SlurmSubmission):
         return '''
 # Unzip PDB files if they exist
 if [ -f pdb_files.zip ]; then
-    unzip pdb_files.zip
+    unzip -o pdb_files.zip
 fi
 
 module load cuda
-source ~/.bash_profile
-conda activate neuralplexer_dev
+''' + self.activate_environment('neuralplexer_dev') + '''
 
 # function for one call
 run_neuralplexer() {
@@ -73,6 +78,7 @@ run_neuralplexer() {
     fi
 }
 COUNTER=0
+RUN_COUNT=0
 while IFS=',' read -r receptor_seq ligand_smiles pdb_file || [ -n "$receptor_seq" ]; do
     # Remove any surrounding quotes and whitespace
     receptor_seq=$(echo "$receptor_seq" | sed 's/^[[:space:]"]*//;s/[[:space:]"]*$//')
@@ -80,16 +86,28 @@ while IFS=',' read -r receptor_seq ligand_smiles pdb_file || [ -n "$receptor_seq
     pdb_file=$(echo "$pdb_file" | sed 's/^[[:space:]"]*//;s/[[:space:]"]*$//')
 
     # Generate a unique output file name
-    output_file="output/result_$(printf "%04d" $COUNTER)"
+    item_name="result_$(printf "%04d" $COUNTER)"
+    output_file="output/$item_name"
     COUNTER=$((COUNTER+1))
 
+    # Skip items finished before a timeout or preemption
+    if item_done "$item_name"; then
+        continue
+    fi
+
     # Run Neuralplexer for this input
-    run_neuralplexer "$receptor_seq" "$ligand_smiles" "$pdb_file" "$output_file"
+    ITEM_START=$(date +%s)
+    run_neuralplexer "$receptor_seq" "$ligand_smiles" "$pdb_file" "$output_file" && mark_done "$item_name" "$output_file"
+    RUN_COUNT=$((RUN_COUNT+1))
+    record_progress $COUNTER $RUN_COUNT $(( $(date +%s) - ITEM_START ))
 
 done < <(tail -n +2 input.csv)  # Skip the header row
 ''' + f'''
+# per sample confidence, fetched by the server so users can triage without downloading
+{self.summarize_results('neuralplexer', 'output')}
+
 # zip up the results into the expected format
-tar -czvf {self.remote_working_directory}/{self.get_output_filename()} output
+tar -czvf {self.remote_working_directory}/{self.get_output_filename()} output && {self.clear_checkpoints()}
 
 # clean up
 rm -rf *.pdb
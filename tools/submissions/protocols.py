@@ -0,0 +1,116 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Input validation and submission construction for each protocol.
+
+Shared by the HTML forms and the batch API so both accept exactly the same inputs.
+Inputs are passed around as a dict of form field name to a local file path.
+'''
+import os
+import zipfile
+
+from tools.submissions.slurm_submission import DummySubmissionWithFileTransfer
+from tools.submissions.neuralplexer_submission import NeuralplexerSubmission
+from tools.submissions.colabfold_submission import ColabFold2Submission
+
+
+def _validate_dummy(temp_dir, inputs):
+    pass
+
+
+def _validate_neuralplexer(temp_dir, inputs):
+    csv_path = inputs['csv_file']
+    zip_path = inputs.get('zip_file')
+    pdb_names = set()
+    if zip_path:
+        with zipfile.ZipFile(zip_path) as zf:
+            pdb_names = set(zf.namelist())
+
+    with open(csv_path, 'r') as f:
+        header = f.readline().strip()
+        if header != 'protein_seq,smiles,pdb':
+            raise ValueError('Invalid CSV header')
+        for line in f:
+            fields = line.strip().split(',')
+            if len(fields) != 3:
+                raise ValueError('Invalid CSV format')
+            if fields[2] not in ['', None] and fields[2] not in pdb_names:
+                raise ValueError('PDB file not found')
+
+
+def _validate_colabfold2(temp_dir, inputs):
+    with open(inputs['fasta_file'], 'r') as f:
+        if not f.read().startswith('>'):
+            raise ValueError('Invalid FASTA format')
+
+
+def _dummy_submission(job, inputs, **kwargs):
+    return DummySubmissionWithFileTransfer(input_filepath=inputs['input_file'], job=job, **kwargs)
+
+
+def _neuralplexer_submission(job, inputs, **kwargs):
+    zip_path = inputs.get('zip_file')
+    if not zip_path:
+        # the script expects the archive to exist, send an empty one
+        zip_path = os.path.join(os.path.dirname(inputs['csv_file']), 'pdb_files.zip')
+        open(zip_path, 'a').close()
+    return NeuralplexerSubmission(csv_path=inputs['csv_file'], zip_path=zip_path, job=job, **kwargs)
+
+
+def _colabfold2_submission(job, inputs, **kwargs):
+    return ColabFold2Submission(fasta_file_path=inputs['fasta_file'], job=job, **kwargs)
+
+
+# submission_type -> file fields, validator and submission factory
+PROTOCOLS = {
+    'dummy': {
+        'required': ['input_file'],
+        'optional': [],
+        'validate': _validate_dummy,
+        'submission': _dummy_submission,
+    },
+    'NeuralPlexer': {
+        'required': ['csv_file'],
+        'optional': ['zip_file'],
+        'validate': _validate_neuralplexer,
+        'submission': _neuralplexer_submission,
+    },
+    'ColabFold2': {
+        'required': ['fasta_file'],
+        'optional': [],
+        'validate': _validate_colabfold2,
+        'submission': _colabfold2_submission,
+    },
+}
+
+
+def get_protocol(protocol):
+    if protocol not in PROTOCOLS:
+        raise ValueError(f"Unknown protocol {protocol}, expected one of {list(PROTOCOLS)}")
+    return PROTOCOLS[protocol]
+
+
+def validate_inputs(protocol, temp_dir, inputs):
+    """Raise ValueError if `inputs` are not acceptable for `protocol`."""
+    spec = get_protocol(protocol)
+    missing = [name for name in spec['required'] if not inputs.get(name)]
+    if missing:
+        raise ValueError(f"Missing required input(s): {', '.join(missing)}")
+    unknown = set(inputs) - set(spec['required']) - set(spec['optional'])
+    if unknown:
+        raise ValueError(f"Unexpected input(s): {', '.join(sorted(unknown))}")
+    spec['validate'](temp_dir, inputs)
+
+
+def create_submission(protocol, job, inputs, remote_working_directory, slurm_config):
+    """Build the SlurmSubmission for an already validated and registered job."""
+    spec = get_protocol(protocol)
+    return spec['submission'](
+        job,
+        inputs,
+        remote_working_directory=remote_working_directory,
+        **slurm_config
+    )
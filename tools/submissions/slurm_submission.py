@@ -12,6 +12,14 @@ from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from typing import List, Dict
 
+from tools.profiling import get_sampler_script
+
+import logging
+logger = logging.getLogger(__name__)
+
+# stdlib only script run at the end of jobs, see tools/submissions/summarize_results.py
+SUMMARIZER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'summarize_results.py')
+
 @dataclass
 class FileTransfer:
     local_path: str
@@ -20,6 +28,9 @@ class FileTransfer:
 
 
 class SlurmSubmission(ABC):
+    # whether the scripts call `activate_environment`, packed images are ignored otherwise
+    supports_env_image = False
+
     def __init__(
             self,
             remote_working_directory,
@@ -31,7 +42,12 @@ class SlurmSubmission(ABC):
             time_limit,
             nodes,
             ntasks_per_node,
-            mem
+            mem,
+            use_node_scratch=False,
+            sample_interval=0,
+            sampler_command=None,
+            env_image=None,
+            env_cache_dir='/tmp/$USER/kestrel_envs'
     ):
         self.remote_working_directory = f"{remote_working_directory}/{job.job_id}"
         self.job = job
@@ -43,7 +59,20 @@ class SlurmSubmission(ABC):
         self.nodes = nodes
         self.ntasks_per_node = ntasks_per_node
         self.mem = mem
+        # compute in node local $TMPDIR and only write the final archive to shared storage
+        self.use_node_scratch = use_node_scratch
+        # seconds between GPU/CPU utilization samples, 0 disables profiling
+        self.sample_interval = sample_interval
+        self.sampler_command = sampler_command
+        # packed environment (conda-pack tarball or squashfs) extracted once per node and reused
+        if env_image and not self.supports_env_image:
+            logger.warning(f"{type(self).__name__} does not use packed environments, ignoring {env_image}")
+            env_image = None
+        self.env_image = env_image
+        self.env_cache_dir = env_cache_dir
         self.files_to_transfer: List[FileTransfer] = []
+        # units of work the scripts report progress on, None if unknown
+        self.total_items = None
 
     @abstractmethod
     def _generate_script(self):
@@ -53,12 +82,9 @@ class SlurmSubmission(ABC):
     def _generate_header(self):
         pass
 
-    def generate_script(self):
-        header = self._generate_header()
-        script = self._generate_script()
-
-        preamble = f"""cd {self.remote_working_directory}"""+"""
-############### CARBON TRACKING
+    def _generate_preamble(self, stage=0, final_stage=True):
+        return f"""cd {self.remote_working_directory}
+""" + self._sentinel_preamble(stage, final_stage) + """############### CARBON TRACKING
 # start codecarbon
 PID=$(/projects/proteinml/software/carbon/start_tracker.sh)
 echo main
@@ -67,23 +93,266 @@ echo $PID
 
 # Define a cleanup function
 cleanup() {
+    EXIT_STATUS=$?
     echo "Cleaning up..."
     kill -SIGINT $PID
-    sleep 10
-}
+""" + self._sampler_cleanup() + """    sleep 10
+""" + self._scratch_cleanup() + self._sentinel_cleanup(final_stage) + """}
 # # Set the trap
 trap cleanup EXIT
 #################### END CARBON TRACKING
-source ~/.bash_profile
-"""
+""" + self._sampler_preamble(stage) + self._environment_preamble() + self._progress_preamble() + self._scratch_preamble() + self._checkpoint_preamble()
+
+    def generate_script(self):
+        header = self._generate_header()
+        script = self._generate_script()
+
         if type(script) == str:
-            return [header + preamble + script]
+            return [header + self._generate_preamble() + script]
         elif type(script) == list:
             scripts = []
             for i, s in enumerate(script):
-                scripts.append(header[i] + preamble + s)
+                scripts.append(header[i] + self._generate_preamble(stage=i, final_stage=i == len(script) - 1) + s)
             return scripts
 
+    @property
+    def sentinel_file(self):
+        return f"{self.remote_working_directory}/done.json"
+
+    def _sentinel_preamble(self, stage, final_stage):
+        """`write_sentinel STATUS` atomically writes done.json describing how the job ended.
+
+        The final stage always writes it, earlier stages only when they fail. A
+        sentinel left by an earlier run of the job is removed first.
+        """
+        output = f"{self.remote_working_directory}/{self.get_output_filename()}"
+        return f"""############### COMPLETION SENTINEL
+rm -f {self.sentinel_file}
+write_sentinel() {{
+    local SIZE=0
+    local CHECKSUM=""
+    if [ -f {output} ]; then
+        SIZE=$(stat -c %s {output})
+        CHECKSUM=$(sha256sum {output} | cut -d ' ' -f 1)
+    fi
+    printf '{{"exit_status": %d, "stage": {stage}, "final_stage": {'true' if final_stage else 'false'}, "slurm_job_id": "%s", "output_size": %d, "sha256": "%s", "finished": %d}}\\n' \\
+        "$1" "$SLURM_JOB_ID" "$SIZE" "$CHECKSUM" "$(date +%s)" > {self.sentinel_file}.tmp
+    mv {self.sentinel_file}.tmp {self.sentinel_file}
+}}
+#################### END COMPLETION SENTINEL
+"""
+
+    def _sentinel_cleanup(self, final_stage):
+        if final_stage:
+            return """    write_sentinel $EXIT_STATUS
+"""
+        return """    if [ "$EXIT_STATUS" -ne 0 ]; then
+        write_sentinel $EXIT_STATUS
+    fi
+"""
+
+    @property
+    def env_version(self):
+        """Version of the packed environment, the image file name without extension."""
+        if not self.env_image:
+            return None
+        name = os.path.basename(self.env_image)
+        for extension in ('.tar.gz', '.tgz', '.sqsh', '.squashfs'):
+            if name.endswith(extension):
+                return name[:-len(extension)]
+        return name
+
+    def _environment_preamble(self):
+        """The login environment is always sourced, it sets up `module`. With an
+        image, `activate_environment` extracts it to node local storage under a
+        lock, unless an earlier job on the node already did, and activates it."""
+        if not self.env_image:
+            return """source ~/.bash_profile
+"""
+        if self.env_image.endswith(('.sqsh', '.squashfs')):
+            extract = 'unsquashfs -f -d "$ENV_DIR" "$ENV_IMAGE" > /dev/null'
+        else:
+            extract = 'mkdir -p "$ENV_DIR" && tar -xzf "$ENV_IMAGE" -C "$ENV_DIR"'
+        return f"""source ~/.bash_profile
+############### PACKED ENVIRONMENT
+ENV_IMAGE={self.env_image}
+ENV_DIR={self.env_cache_dir}/{self.env_version}
+""" + """activate_environment() {
+    mkdir -p "$(dirname "$ENV_DIR")"
+    (
+        flock 9
+        if [ ! -f "$ENV_DIR/.ready" ]; then
+            # a half extracted directory from a killed job is discarded
+            rm -rf "$ENV_DIR"
+            """ + extract + """ || exit 1
+            # conda-pack environments fix their prefixes for the new location
+            if [ -x "$ENV_DIR/bin/conda-unpack" ]; then
+                "$ENV_DIR/bin/conda-unpack"
+            fi
+            touch "$ENV_DIR/.ready"
+        fi
+    ) 9> "$ENV_DIR.lock" || return 1
+    source "$ENV_DIR/bin/activate"
+}
+#################### END PACKED ENVIRONMENT
+"""
+
+    def activate_environment(self, conda_env):
+        """Shell activating the packed environment if configured, else the named conda env.
+
+        Protocols calling this should set `supports_env_image`.
+        """
+        if self.env_image:
+            return "activate_environment || exit 1"
+        return f"conda activate {conda_env}"
+
+    @property
+    def utilization_file(self):
+        return f"{self.remote_working_directory}/utilization.csv"
+
+    def _sampler_preamble(self, stage):
+        if not self.sample_interval:
+            return ""
+        return get_sampler_script(self.utilization_file, stage, self.sample_interval, self.sampler_command)
+
+    def _sampler_cleanup(self):
+        if not self.sample_interval:
+            return ""
+        return """    kill $SAMPLER_PID
+"""
+
+    @property
+    def progress_file(self):
+        # always on shared storage so the server can read it while the job runs
+        return f"{self.remote_working_directory}/progress.csv"
+
+    def _progress_preamble(self):
+        return f"""############### PROGRESS
+PROGRESS_FILE={self.progress_file}
+STAGE_START=$(date +%s)
+""" + """# items done in total, items done by this run, seconds on the last item, seconds since the stage started, unix time
+record_progress() {
+    local NOW=$(date +%s)
+    echo "$1,$2,$3,$((NOW - STAGE_START)),$NOW" >> "$PROGRESS_FILE"
+}
+#################### END PROGRESS
+"""
+
+    @property
+    def work_directory(self):
+        """Directory the scripts compute in, node local scratch if enabled."""
+        if self.use_node_scratch:
+            return "$SCRATCH_DIR"
+        return self.remote_working_directory
+
+    def _scratch_preamble(self):
+        """Copy inputs to node local scratch and move there."""
+        if not self.use_node_scratch:
+            return ""
+        inputs = " ".join(f.remote_path for f in self.files_to_transfer if f.is_input)
+        return f"""############### NODE SCRATCH
+SCRATCH_DIR="${{TMPDIR:-/tmp/$USER}}/kestrel_{self.job.job_id}_${{SLURM_JOB_ID}}"
+mkdir -p "$SCRATCH_DIR"
+cp {inputs} "$SCRATCH_DIR"/
+cd "$SCRATCH_DIR"
+#################### END NODE SCRATCH
+"""
+
+    @property
+    def checkpoint_directory(self):
+        # on shared storage so markers survive the node a timed out job ran on
+        return f"{self.remote_working_directory}/checkpoints"
+
+    def _checkpoint_preamble(self):
+        """Helpers for scripts to skip items finished by an earlier, interrupted run.
+
+        `item_done NAME` tests for a completion marker and `mark_done NAME [PATH]`
+        writes one. With node scratch the item's outputs at PATH are archived next
+        to the marker and restored here on restart, since scratch does not survive.
+        """
+        preamble = f"""############### CHECKPOINTS
+CHECKPOINT_DIR={self.checkpoint_directory}
+mkdir -p "$CHECKPOINT_DIR"
+""" + """item_done() {
+    [ -f "$CHECKPOINT_DIR/$1.done" ]
+}
+"""
+        if self.use_node_scratch:
+            preamble += """mark_done() {
+    if [ -n "$2" ]; then
+        tar -cf "$CHECKPOINT_DIR/$1.tar.tmp" "$2" && mv "$CHECKPOINT_DIR/$1.tar.tmp" "$CHECKPOINT_DIR/$1.tar"
+    fi
+    touch "$CHECKPOINT_DIR/$1.done"
+}
+# restore outputs of items finished by an earlier run
+for CHECKPOINT in "$CHECKPOINT_DIR"/*.tar; do
+    [ -f "$CHECKPOINT" ] && tar -xf "$CHECKPOINT"
+done
+"""
+        else:
+            preamble += """mark_done() {
+    touch "$CHECKPOINT_DIR/$1.done"
+}
+"""
+        return preamble + """#################### END CHECKPOINTS
+"""
+
+    def clear_checkpoints(self):
+        """Shell line removing the checkpoints, run once the final archive is written.
+
+        With node scratch they hold a second copy of every item's outputs.
+        """
+        return 'rm -rf "$CHECKPOINT_DIR"'
+
+    def sync_checkpoint(self, path):
+        """Shell line copying new files under `path` from scratch to the checkpoint directory.
+
+        For tools that resume by themselves from their partial outputs, which
+        would otherwise be lost with the node. Pair with `restore_checkpoint`.
+        """
+        if not self.use_node_scratch:
+            return ""
+        return f'cp -ru {self.work_directory}/{path} "$CHECKPOINT_DIR"/'
+
+    def restore_checkpoint(self, path):
+        """Shell line putting `path` saved by `sync_checkpoint` back into scratch."""
+        if not self.use_node_scratch:
+            return ""
+        return f'[ -d "$CHECKPOINT_DIR/{path}" ] && cp -r "$CHECKPOINT_DIR/{path}" {self.work_directory}/'
+
+    def _scratch_cleanup(self):
+        if not self.use_node_scratch:
+            return ""
+        return """    rm -rf "$SCRATCH_DIR"
+"""
+
+    def stage_back(self, path):
+        """Shell line copying `path` from scratch to the shared working directory.
+
+        Only needed for intermediates a later stage reads, the final archive is
+        written to shared storage directly.
+        """
+        if not self.use_node_scratch:
+            return ""
+        return f"cp -r {self.work_directory}/{path} {self.remote_working_directory}/"
+
+    @property
+    def summary_file(self):
+        return f"{self.remote_working_directory}/summary.json"
+
+    def add_summarizer(self):
+        """Transfer the result summarizer with the inputs, call from `__init__` of protocols using `summarize_results`."""
+        self.add_file_transfer(SUMMARIZER_PATH, f"{self.remote_working_directory}/summarize_results.py")
+
+    def summarize_results(self, protocol, results_path):
+        """Shell line writing summary.json with per item metrics of the results at `results_path`.
+
+        Runs before the archive is built so the summary exists when the sentinel
+        reports completion. A failing summary does not fail the job.
+        """
+        return (f"python3 {self.remote_working_directory}/summarize_results.py {protocol} {results_path} {self.summary_file} "
+                f"|| echo 'Could not summarize results'")
+
     def get_output_filename(self):
         return self.job.output_filename
 
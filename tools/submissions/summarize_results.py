@@ -0,0 +1,122 @@
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Per item confidence metrics of a finished job, run on the cluster.
+
+Only uses the standard library since it runs with whatever python3 the compute
+node has, it is copied next to the job scripts like the inputs. Writes a small
+JSON file the server fetches on completion so results can be triaged without
+downloading the archive:
+
+    {"protocol": "colabfold", "columns": ["item", "rank", ...], "rows": [{"item": ..., ...}, ...]}
+
+Usage: python3 summarize_results.py PROTOCOL RESULTS_DIRECTORY OUTPUT_JSON
+'''
+import os
+import re
+import sys
+import json
+
+# {query}_scores_rank_001_alphafold2_ptm_model_1_seed_000.json
+COLABFOLD_SCORES = re.compile(r'^(?P<item>.+)_scores_rank_(?P<rank>\d+)_(?P<model>.+)\.json$')
+# prot_0.pdb, one per sample
+NEURALPLEXER_SAMPLE = re.compile(r'^prot_(?P<sample>\d+)\.pdb$')
+
+
+def _mean(values):
+    return round(sum(values) / len(values), 2) if values else None
+
+
+def _round(value):
+    return round(value, 4) if isinstance(value, (int, float)) else None
+
+
+def summarize_colabfold(results_directory):
+    """One row per model of each query, from the score JSONs colabfold writes next to the structures."""
+    rows = []
+    for name in sorted(os.listdir(results_directory)):
+        match = COLABFOLD_SCORES.match(name)
+        if not match:
+            continue
+        with open(os.path.join(results_directory, name)) as f:
+            scores = json.load(f)
+        rows.append({
+            'item': match.group('item'),
+            'rank': int(match.group('rank')),
+            'model': match.group('model'),
+            'mean_plddt': _mean(scores.get('plddt') or []),
+            'ptm': _round(scores.get('ptm')),
+            'iptm': _round(scores.get('iptm')),
+            'max_pae': _round(scores.get('max_pae')),
+        })
+    return ['item', 'rank', 'model', 'mean_plddt', 'ptm', 'iptm', 'max_pae'], rows
+
+
+def _ca_bfactors(path):
+    """B-factors of the CA atoms of a PDB file."""
+    values = []
+    with open(path) as f:
+        for line in f:
+            if line.startswith(('ATOM', 'HETATM')) and line[12:16].strip() == 'CA':
+                try:
+                    values.append(float(line[60:66]))
+                except ValueError:
+                    continue
+    return values
+
+
+def summarize_neuralplexer(results_directory):
+    """One row per sample of each input, neuralplexer stores per residue confidence in the B-factor column.
+
+    Samples are ranked within their input by mean confidence.
+    """
+    rows = []
+    for item in sorted(os.listdir(results_directory)):
+        item_directory = os.path.join(results_directory, item)
+        if not os.path.isdir(item_directory):
+            continue
+        item_rows = []
+        for name in os.listdir(item_directory):
+            match = NEURALPLEXER_SAMPLE.match(name)
+            if not match:
+                continue
+            bfactors = _ca_bfactors(os.path.join(item_directory, name))
+            # structures written without confidence have all B-factors at zero
+            confidence = _mean(bfactors) if any(bfactors) else None
+            item_rows.append({
+                'item': item,
+                'sample': int(match.group('sample')),
+                'mean_plddt': confidence,
+                'n_residues': len(bfactors),
+            })
+        item_rows.sort(key=lambda row: (row['mean_plddt'] is None, -(row['mean_plddt'] or 0), row['sample']))
+        for rank, row in enumerate(item_rows, start=1):
+            row['rank'] = rank
+        rows.extend(item_rows)
+    return ['item', 'sample', 'rank', 'mean_plddt', 'n_residues'], rows
+
+
+SUMMARIZERS = {
+    'colabfold': summarize_colabfold,
+    'neuralplexer': summarize_neuralplexer,
+}
+
+
+def main(argv):
+    if len(argv) != 4 or argv[1] not in SUMMARIZERS:
+        sys.stderr.write(f"usage: {argv[0]} {{{','.join(SUMMARIZERS)}}} RESULTS_DIRECTORY OUTPUT_JSON\n")
+        return 2
+    protocol, results_directory, output = argv[1:]
+    columns, rows = SUMMARIZERS[protocol](results_directory)
+    # written atomically so a partial summary is never fetched
+    with open(output + '.tmp', 'w') as f:
+        json.dump({'protocol': protocol, 'columns': columns, 'rows': rows}, f)
+    os.replace(output + '.tmp', output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,14 @@
+# wsgi.py
+'''
+* Author: Evan Komp
+* Created: 10/19/2026
+* Company: National Renewable Energy Lab, Bioeneergy Science and Technology
+* License: MIT
+
+Production entry point, eg. `gunicorn -c gunicorn.conf.py wsgi:app`.
+Do not preload the app, each worker process builds its own state.
+'''
+import os
+from app import create_app
+
+app = create_app(os.environ.get('KESTREL_CONFIG', 'config.ini'))